@@ -1,80 +1,126 @@
 """Humanization (timing, articulation, chord roll), hand assignment, section analysis, and pedal event generation."""
 
-import random
 import heapq
+from operator import attrgetter
 import numpy as np
 from typing import List, Set, Dict, Optional
 from dataclasses import dataclass, field
 from models import Note, MusicalSection, KeyEvent, Finger
 from core import TempoMap, get_time_groups
 
+_START_TIME = attrgetter('start_time')   # Sort key for notes.
+
 
 class Humanizer:
     """Applies timing variance, articulation, chord roll, drift correction, and tempo rubato per section pace."""
 
+    __slots__ = ('config', 'left_hand_drift', 'right_hand_drift', 'rng',
+                 '_vary_timing', '_vary_articulation', '_drift_correction', '_chord_roll',
+                 '_sigma', '_articulation', '_drift_decay',
+                 '_tempo_sway', '_sway_intensity', '_invert_sway')
+
     def __init__(self, config: Dict):
         self.config = config
         self.left_hand_drift = 0.0
         self.right_hand_drift = 0.0
+        self.rng = np.random.default_rng()
+        # Read the config once; the passes below only touch these attributes.
+        self._vary_timing = config.get('vary_timing')
+        self._vary_articulation = config.get('vary_articulation')
+        self._drift_correction = config.get('enable_drift_correction')
+        self._chord_roll = config.get('enable_chord_roll')
+        self._sigma = config.get('timing_variance')
+        self._articulation = config.get('articulation')
+        self._drift_decay = config.get('drift_decay_factor')
+        self._tempo_sway = config.get('enable_tempo_sway')
+        self._sway_intensity = config.get('tempo_sway_intensity', 0.0)
+        self._invert_sway = config.get('invert_tempo_sway', False)
 
     def apply_to_hand(self, notes: List[Note], hand: str, resync_points: Set[float]):
         """Apply timing/articulation/roll per group; resync_points are times where both hands hit together (decay drift)."""
-        if not any([self.config.get('vary_timing'), self.config.get('vary_articulation'), self.config.get('enable_drift_correction'), self.config.get('enable_chord_roll')]): return
-
-        time_groups = get_time_groups(notes)
-        for group in time_groups:
-            is_resync_point = round(group[0].start_time, 2) in resync_points
+        vary_timing = self._vary_timing
+        vary_articulation = self._vary_articulation
+        drift_correction = self._drift_correction
+        chord_roll = self._chord_roll
+        if not (vary_timing or vary_articulation or drift_correction or chord_roll): return
+        sigma = self._sigma
+        articulation = self._articulation
+        drift_decay = self._drift_decay
 
-            if self.config.get('enable_drift_correction') and is_resync_point:
-                if hand == 'left': self.left_hand_drift *= self.config.get('drift_decay_factor')
-                else: self.right_hand_drift *= self.config.get('drift_decay_factor')
-            
-            group_timing_offset = 0.0
-            if self.config.get('vary_timing'):
-                sigma = self.config.get('timing_variance')
-                group_timing_offset = random.gauss(0, sigma)
-                group_timing_offset = max(-3*sigma, min(3*sigma, group_timing_offset))
-
-            group_articulation = self.config.get('articulation')
-            if self.config.get('vary_articulation'):
-                group_articulation -= (random.random() * 0.1)
-                
-            if self.config.get('enable_chord_roll') and len(group) > 1:
-                group.sort(key=lambda n: n.pitch)
-                for i, note in enumerate(group):
-                    note.start_time += (i * 0.006)
-                    
-            for note in group:
-                current_drift = self.left_hand_drift if hand == 'left' else self.right_hand_drift
-                note.start_time += group_timing_offset
-                if self.config.get('enable_drift_correction'):
-                    note.start_time += current_drift
-                
-                note.duration *= group_articulation
-                if note.duration < 0.03: note.duration = 0.03
+        if not notes: return
 
-            if self.config.get('enable_drift_correction'):
-                if hand == 'left': self.left_hand_drift += group_timing_offset
-                else: self.right_hand_drift += group_timing_offset
+        time_groups = get_time_groups(notes)
+        n_groups = len(time_groups)
+        # Draw every group's random offsets up front in one batch.
+        if vary_timing:
+            offsets = np.clip(self.rng.normal(0.0, sigma, n_groups), -3*sigma, 3*sigma)
+        else:
+            offsets = np.zeros(n_groups)
+        if vary_articulation:
+            articulations = articulation - self.rng.random(n_groups) * 0.1
+        else:
+            articulations = np.full(n_groups, articulation, dtype=np.float64)
+
+        # Work on the hand as arrays: groups are contiguous runs of *notes*.
+        count = len(notes)
+        group_sizes = np.fromiter((len(g) for g in time_groups), dtype=np.int64, count=n_groups)
+        group_first = np.concatenate(([0], np.cumsum(group_sizes)[:-1]))
+        group_id = np.repeat(np.arange(n_groups), group_sizes)
+        starts = np.fromiter((n.start_time for n in notes), dtype=np.float64, count=count)
+        durations = np.fromiter((n.duration for n in notes), dtype=np.float64, count=count)
+        first_starts = starts[group_first].tolist()
+
+        if chord_roll:
+            # Roll each chord upward: offset by rank within the group, ordered by pitch.
+            pitches = np.fromiter((n.pitch for n in notes), dtype=np.int64, count=count)
+            order = np.lexsort((pitches, group_id))
+            rank = np.empty(count, dtype=np.int64)
+            rank[order] = np.arange(count) - group_first[group_id[order]]
+            starts += rank * 0.006
+
+        shifts = offsets
+        if drift_correction:
+            # Drift is a running sum of past offsets, decayed at resync points.
+            drift = self.left_hand_drift if hand == 'left' else self.right_hand_drift
+            group_drift = np.empty(n_groups)
+            for g, (first_start, group_timing_offset) in enumerate(zip(first_starts, offsets.tolist())):
+                if round(first_start, 2) in resync_points:
+                    drift *= drift_decay
+                group_drift[g] = drift
+                drift += group_timing_offset
+            if hand == 'left': self.left_hand_drift = drift
+            else: self.right_hand_drift = drift
+            shifts = offsets + group_drift
+
+        starts += shifts[group_id]
+        durations *= articulations[group_id]
+        np.maximum(durations, 0.03, out=durations)
+        for note, start, duration in zip(notes, starts.tolist(), durations.tolist()):
+            note.start_time = start
+            note.duration = duration
+            note.end_time = start + duration
 
     def apply_tempo_rubato(self, all_notes: List[Note], sections: List[MusicalSection]):
         """Shift note times within each section by a sine curve; intensity scales by section pace (fast/slow)."""
-        if not self.config.get('enable_tempo_sway'): return
-        base_intensity = self.config.get('tempo_sway_intensity', 0.0)
-        invert_sway = self.config.get('invert_tempo_sway', False)
+        if not self._tempo_sway: return
+        base_intensity = self._sway_intensity
+        invert_sway = self._invert_sway
+        # Sections hold the analyzed notes; all_notes may be copies, so map by id.
         note_map = {note.id: note for note in all_notes}
+        pace_multipliers = {'fast': (0.25, 1.5), 'slow': (1.5, 0.25)}   # (normal, inverted)
         for section in sections:
-            pace_multiplier = 1.0
-            if section.pace_label == 'fast': pace_multiplier = 1.5 if invert_sway else 0.25
-            elif section.pace_label == 'slow': pace_multiplier = 0.25 if invert_sway else 1.5
             section_duration = section.end_time - section.start_time
             if section_duration < 1.0: continue
+            pace_multiplier = pace_multipliers.get(section.pace_label, (1.0, 1.0))[1 if invert_sway else 0]
             intensity = base_intensity * pace_multiplier
-            for note in section.notes:
-                if note.id in note_map:
-                    rel_pos = (note.start_time - section.start_time) / section_duration
-                    time_shift = np.sin(rel_pos * np.pi) * intensity
-                    note_map[note.id].start_time -= time_shift
+            sec_notes = [n for n in section.notes if n.id in note_map]
+            if not sec_notes: continue
+            starts = np.fromiter((n.start_time for n in sec_notes), dtype=np.float64, count=len(sec_notes))
+            time_shifts = np.sin((starts - section.start_time) / section_duration * np.pi) * intensity
+            for note, time_shift in zip(sec_notes, time_shifts.tolist()):
+                shifted = note_map[note.id]
+                shifted.start_time -= time_shift
+                shifted.end_time = shifted.start_time + shifted.duration
 
 
 class FingeringEngine:
@@ -95,10 +141,14 @@ class FingeringEngine:
         note.hand = 'left' if note.pitch < 60 else 'right'  # 60 = middle C
 
     def _assign_chord(self, chord_notes: List[Note]):
-        unassigned = [n for n in chord_notes if n.hand == 'unknown']
+        pitch_sum = 0
+        unassigned = []
+        for n in chord_notes:
+            if n.hand == 'unknown':
+                pitch_sum += n.pitch
+                unassigned.append(n)
         if not unassigned: return
-        avg_pitch = sum(n.pitch for n in unassigned) / len(unassigned)
-        hand = 'left' if avg_pitch < 60 else 'right'  # 60 = middle C
+        hand = 'left' if pitch_sum < 60 * len(unassigned) else 'right'  # Average below middle C.
         for n in unassigned: n.hand = hand
 
 
@@ -106,8 +156,15 @@ class SectionAnalyzer:
     """Splits notes into sections by measures (if time sigs) or by grand pauses; classifies articulation and pace."""
 
     def __init__(self, notes: List[Note], tempo_map: TempoMap):
-        self.notes = sorted(notes, key=lambda n: n.start_time)
+        self.notes = list(notes)
         self.tempo_map = tempo_map
+        count = len(self.notes)
+        self._start_times = np.fromiter((n.start_time for n in self.notes), dtype=np.float64, count=count)
+        # Playback passes notes already sorted by start; only re-sort (and re-read) when they are not.
+        if (self._start_times[1:] < self._start_times[:-1]).any():
+            self.notes.sort(key=_START_TIME)
+            self._start_times = np.fromiter((n.start_time for n in self.notes), dtype=np.float64, count=count)
+        self._end_times = self._start_times + np.fromiter((n.duration for n in self.notes), dtype=np.float64, count=count)
 
     def analyze(self) -> List[MusicalSection]:
         """Use measure boundaries if time signatures exist, else segment by silence (>2 beats gap)."""
@@ -119,32 +176,38 @@ class SectionAnalyzer:
 
     def _analyze_by_silence(self) -> List[MusicalSection]:
         """Segment at gaps > 2 beats; classify articulation (left-hand overlap ratio) and pace per section."""
-        boundaries = self._detect_grand_pauses()
+        boundaries = np.asarray(self._detect_grand_pauses(), dtype=np.int64)
+        # Boundaries are strictly increasing, so every section is a non-empty slice.
+        sec_starts = boundaries[:-1]
+        start_times = self._start_times[sec_starts]
+        end_times = np.maximum.reduceat(self._end_times, sec_starts)
+        start_beats = self.tempo_map.times_to_beats(start_times)
+        end_beats = self.tempo_map.times_to_beats(end_times)
+        articulations = self._classify_sections_articulation(sec_starts)
+        span_beats = end_beats - start_beats
+        npb = np.divide(np.diff(boundaries), span_beats, out=np.zeros(len(sec_starts)), where=span_beats > 0)
+        paces = np.where(npb > 3.5, 'fast', np.where((npb < 1.0) & (span_beats > 0), 'slow', 'normal')).tolist()
         sections = []
-        for i in range(len(boundaries) - 1):
-            start_idx = boundaries[i]
-            end_idx = boundaries[i+1] - 1
-            if start_idx > end_idx: continue
-            sec_notes = self.notes[start_idx : end_idx+1]
-            if not sec_notes: continue
-            start_time = sec_notes[0].start_time
-            end_time = max(n.end_time for n in sec_notes)
-            start_beat = self.tempo_map.time_to_beat(start_time)
-            end_beat = self.tempo_map.time_to_beat(end_time)
-            articulation = self._classify_bass_articulation(sec_notes)
-            pace = self._classify_pace_beats(sec_notes, start_beat, end_beat)
-            sections.append(MusicalSection(start_time, end_time, sec_notes, articulation, pace, start_beat, end_beat))
+        for i, (start_idx, end_idx) in enumerate(zip(sec_starts.tolist(), boundaries[1:].tolist())):
+            end_time = float(end_times[i])
+            sections.append(MusicalSection(float(start_times[i]), end_time, self.notes[start_idx:end_idx], articulations[i], paces[i],
+                                           float(start_beats[i]), float(end_beats[i]), end_time))
         return sections
 
     def _analyze_by_measures(self) -> List[MusicalSection]:
         """Merge consecutive measures with same articulation/pace into sections."""
-        total_dur = max(n.end_time for n in self.notes)
+        total_dur = float(self._end_times.max())
         measures = self.tempo_map.get_measure_boundaries(total_dur)
         sections = []
         current_section_start = measures[0][0] if measures else 0
         current_notes_in_section = []
         prev_style = None
         prev_pace = None
+        # Notes are sorted by start, so each measure is a contiguous slice [lo, hi).
+        m_starts = np.array([m[0] for m in measures], dtype=np.float64)
+        m_ends = np.array([m[1] for m in measures], dtype=np.float64)
+        lo = np.searchsorted(self._start_times, m_starts, side='left')
+        hi = np.searchsorted(self._start_times, m_ends, side='left')
         
         def classify_chunk(chunk_notes, s_time, e_time):
             s_beat = self.tempo_map.time_to_beat(s_time)
@@ -154,7 +217,7 @@ class SectionAnalyzer:
             return art, pace
 
         for i, (m_start, m_end) in enumerate(measures):
-            notes_in_measure = [n for n in self.notes if n.start_time >= m_start and n.start_time < m_end]
+            notes_in_measure = self.notes[lo[i]:hi[i]]
             if not notes_in_measure:
                 style, pace = (prev_style or 'legato'), (prev_pace or 'normal')
             else:
@@ -185,45 +248,52 @@ class SectionAnalyzer:
 
     def _detect_grand_pauses(self) -> List[int]:
         """Return note indices that start a new segment after a gap > 2 beats."""
-        indices = [0]
-        if not self.notes: return indices
-        last_end_time = self.notes[0].end_time
-        for i in range(1, len(self.notes)):
-            current_start = self.notes[i].start_time
-            gap_sec = current_start - last_end_time
-            tempo = self.tempo_map.get_tempo_at(last_end_time)
-            sec_per_beat = tempo / 1_000_000.0
-            gap_beats = gap_sec / sec_per_beat
-            if gap_beats > 2.0:
-                indices.append(i)
-            last_end_time = max(last_end_time, self.notes[i].end_time)
-        indices.append(len(self.notes))
-        return indices
+        if not self.notes: return [0]
+        # Gap to each note is measured from the latest end time of all earlier notes.
+        last_end_times = np.maximum.accumulate(self._end_times)[:-1]
+        gap_sec = self._start_times[1:] - last_end_times
+        sec_per_beat = self.tempo_map.seconds_per_beat_at(last_end_times)
+        gap_beats = gap_sec / sec_per_beat
+        starts = (np.flatnonzero(gap_beats > 2.0) + 1).tolist()
+        return [0] + starts + [len(self.notes)]
 
     def _classify_bass_articulation(self, notes: List[Note]) -> str:
         """Legato / staccato / hybrid from left-hand note duration vs inter-onset ratio."""
         lh_notes = [n for n in notes if n.hand == 'left']
         if len(lh_notes) < 2: return 'legato'
-        total_overlap = 0.0
-        total_possible = 0.0
-        lh_notes.sort(key=lambda n: n.start_time)
-        for i in range(len(lh_notes) - 1):
-            curr = lh_notes[i]
-            next_n = lh_notes[i+1]
-            curr_beat = self.tempo_map.time_to_beat(curr.start_time)
-            next_beat = self.tempo_map.time_to_beat(next_n.start_time)
-            ioi_beats = next_beat - curr_beat
-            if ioi_beats <= 0: continue
-            dur_beats = self.tempo_map.time_to_beat(curr.end_time) - curr_beat
-            ratio = dur_beats / ioi_beats
-            total_overlap += min(ratio, 1.2)
-            total_possible += 1.0
-        if total_possible == 0: return 'legato'
-        avg_ratio = total_overlap / total_possible
+        lh_notes.sort(key=_START_TIME)
+        count = len(lh_notes)
+        start_beats = self.tempo_map.times_to_beats(np.fromiter((n.start_time for n in lh_notes), dtype=np.float64, count=count))
+        end_beats = self.tempo_map.times_to_beats(np.fromiter((n.end_time for n in lh_notes), dtype=np.float64, count=count))
+        ioi_beats = start_beats[1:] - start_beats[:-1]
+        dur_beats = end_beats[:-1] - start_beats[:-1]
+        valid = ioi_beats > 0
+        if not valid.any(): return 'legato'
+        ratios = np.minimum(dur_beats[valid] / ioi_beats[valid], 1.2)
+        avg_ratio = float(ratios.mean())
         if avg_ratio >= 0.95: return 'legato'
         if avg_ratio <= 0.60: return 'staccato'
         return 'hybrid'
 
+    def _classify_sections_articulation(self, sec_starts: np.ndarray) -> List[str]:
+        """_classify_bass_articulation for every section at once; sec_starts are the first note index of each section."""
+        n_sections = len(sec_starts)
+        left = np.flatnonzero(np.fromiter((n.hand == 'left' for n in self.notes), dtype=bool, count=len(self.notes)))
+        if len(left) < 2: return ['legato'] * n_sections
+        sec_of = np.searchsorted(sec_starts, left, side='right') - 1
+        start_beats = self.tempo_map.times_to_beats(self._start_times[left])
+        end_beats = self.tempo_map.times_to_beats(self._end_times[left])
+        ioi_beats = start_beats[1:] - start_beats[:-1]
+        dur_beats = end_beats[:-1] - start_beats[:-1]
+        # Only consecutive left-hand notes inside the same section form a pair.
+        valid = (sec_of[1:] == sec_of[:-1]) & (ioi_beats > 0)
+        pair_sec = sec_of[:-1][valid]
+        ratios = np.minimum(dur_beats[valid] / ioi_beats[valid], 1.2)
+        counts = np.bincount(pair_sec, minlength=n_sections)
+        sums = np.bincount(pair_sec, weights=ratios, minlength=n_sections)
+        avg_ratio = np.divide(sums, counts, out=np.ones(n_sections), where=counts > 0)
+        return np.where(avg_ratio >= 0.95, 'legato', np.where(avg_ratio <= 0.60, 'staccato', 'hybrid')).tolist()
+
     def _classify_pace_beats(self, notes: List[Note], start_beat: float, end_beat: float) -> str:
         """Fast / slow / normal from notes per beat in the span."""
         duration_beats = end_beat - start_beat
@@ -251,28 +321,30 @@ class PedalGenerator:
         
         if style == 'hybrid':
             bass_notes = [n for n in final_notes if n.hand == 'left']
-            bass_notes.sort(key=lambda n: n.start_time)
+            bass_notes.sort(key=_START_TIME)
             if not bass_notes:
                 treble_notes = [n for n in final_notes if n.hand == 'right']
-                treble_notes.sort(key=lambda n: n.start_time)
+                treble_notes.sort(key=_START_TIME)
                 return PedalGenerator._generate_adaptive_pedal_driver(treble_notes)
             return PedalGenerator._generate_adaptive_pedal_driver(bass_notes)
             
         for section in sections:
             lh_notes = [n for n in section.notes if n.hand == 'left']
-            lh_notes.sort(key=lambda n: n.start_time)
+            lh_notes.sort(key=_START_TIME)
             if not lh_notes: 
                 start = section.notes[0].start_time
-                end = max(n.end_time for n in section.notes)
+                end = section.max_end_time
                 events.append(KeyEvent(start, 1, 'pedal', 'down'))
                 events.append(KeyEvent(end, 0, 'pedal', 'up'))
                 continue
                 
             if style == 'rhythmic':
                 groups = get_time_groups(lh_notes)
-                for g in groups:
+                # Groups are contiguous slices of lh_notes, so each group's latest end is one reduceat.
+                ends = np.fromiter((n.end_time for n in lh_notes), dtype=np.float64, count=len(lh_notes))
+                firsts = np.cumsum([0] + [len(g) for g in groups[:-1]])
+                for g, end in zip(groups, np.maximum.reduceat(ends, firsts).tolist()):
                     start = g[0].start_time
-                    end = max(n.end_time for n in g)
                     events.append(KeyEvent(start, 1, 'pedal', 'down'))
                     events.append(KeyEvent(end, 0, 'pedal', 'up'))
             else:
@@ -281,46 +353,36 @@ class PedalGenerator:
 
     @staticmethod
     def _generate_adaptive_pedal_driver(driver_notes: List[Note]) -> List[KeyEvent]:
-        events = []
-        if not driver_notes: return events
+        """Hold pedal across the driver line; lift at gaps > 0.35s and repedal on dissonant steps."""
+        if not driver_notes: return []
 
         PEDAL_LAG = 0.05   # Seconds between pedal up and down when repedaling.
-        SAFE_INTERVALS = {0, 3, 4, 5, 7}   # Unison, m3, M3, P4, P5, octave; keep pedal.
-        UNSAFE_INTERVALS = {1, 6}          # m2, tritone; repedal to avoid clash.
-
-        for i in range(len(driver_notes)):
-            curr = driver_notes[i]
-            next_n = driver_notes[i+1] if i < len(driver_notes) - 1 else None
-            
-            if i == 0:
-                events.append(KeyEvent(curr.start_time, 1, 'pedal', 'down'))
-            
-            gap = 0.0
-            if next_n:
-                gap = next_n.start_time - curr.end_time
-            
-            if gap > 0.35: 
-                events.append(KeyEvent(curr.end_time, 0, 'pedal', 'up'))
-                if next_n: 
-                    events.append(KeyEvent(next_n.start_time, 1, 'pedal', 'down'))
+        # Steps of a m2 or tritone (mod 12) repedal to avoid clash; unison, thirds,
+        # fourths, fifths and the gray-area intervals keep the pedal down.
+        UNSAFE_INTERVAL_MASK = (1 << 1) | (1 << 6)
+
+        count = len(driver_notes)
+        starts = np.fromiter((n.start_time for n in driver_notes), dtype=np.float64, count=count)
+        ends = np.fromiter((n.end_time for n in driver_notes), dtype=np.float64, count=count)
+        pitches = np.fromiter((n.pitch for n in driver_notes), dtype=np.int64, count=count)
+
+        is_gap = (starts[1:] - ends[:-1]) > 0.35
+        intervals = np.abs(np.diff(pitches)) % 12
+        is_repedal = ~is_gap & (((UNSAFE_INTERVAL_MASK >> intervals) & 1) == 1)
+
+        start_list = starts.tolist()
+        end_list = ends.tolist()
+        events = [KeyEvent(start_list[0], 1, 'pedal', 'down')]
+        for i in np.flatnonzero(is_gap | is_repedal).tolist():
+            next_start = start_list[i + 1]
+            if is_gap[i]:
+                events.append(KeyEvent(end_list[i], 0, 'pedal', 'up'))
+                events.append(KeyEvent(next_start, 1, 'pedal', 'down'))
             else:
-                should_repedal = False
-
-                if next_n:
-                    interval = abs(next_n.pitch - curr.pitch) % 12
-                    if interval in SAFE_INTERVALS:
-                        should_repedal = False   # Consonant; keep pedal.
-                    elif interval in UNSAFE_INTERVALS:
-                        should_repedal = True    # Dissonant; repedal.
-                    else:
-                        should_repedal = False   # Gray area; assume safe.
-                
-                if should_repedal and next_n:
-                    events.append(KeyEvent(next_n.start_time, 0, 'pedal', 'up'))
-                    events.append(KeyEvent(next_n.start_time + PEDAL_LAG, 1, 'pedal', 'down'))
-                    
-        final_end = max(n.end_time for n in driver_notes)
-        events.append(KeyEvent(final_end, 0, 'pedal', 'up'))
+                events.append(KeyEvent(next_start, 0, 'pedal', 'up'))
+                events.append(KeyEvent(next_start + PEDAL_LAG, 1, 'pedal', 'down'))
+
+        events.append(KeyEvent(float(ends.max()), 0, 'pedal', 'up'))
         return events
 
     @staticmethod
@@ -328,6 +390,7 @@ class PedalGenerator:
         """Pedal down at each bass note; up then down on harmony change or gap > 0.15s."""
         if not bass_notes: return
         current_bass_pitch = -1
+        final_end = bass_notes[0].end_time
         for i, note in enumerate(bass_notes):
             is_new_harmony = (note.pitch != current_bass_pitch)
             prev_end = bass_notes[i-1].end_time if i > 0 else 0
@@ -341,7 +404,7 @@ class PedalGenerator:
                 events.append(KeyEvent(note.start_time, 0, 'pedal', 'up'))
                 events.append(KeyEvent(note.start_time, 1, 'pedal', 'down'))
             current_bass_pitch = note.pitch
-        final_end = max(n.end_time for n in bass_notes)
+            if note.end_time > final_end: final_end = note.end_time
         events.append(KeyEvent(final_end, 0, 'pedal', 'up'))
 
     @staticmethod
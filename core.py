@@ -1,27 +1,47 @@
 """MIDI parsing, tempo/beat mapping, and pitch-to-key mapping."""
 
+import os
 import mido
 import bisect
-from collections import defaultdict
-from typing import List, Tuple, Dict, Optional
+import heapq
+import numpy as np
+from array import array
+from collections import OrderedDict, deque
+from operator import attrgetter
+from typing import List, Tuple, Optional, Deque
 from models import Note, MidiTrack
 from pynput.keyboard import Key
 
+_START_TIME = attrgetter('start_time')
+
+
+def _group_bounds(starts: List[float], threshold: float) -> List[int]:
+    """Start index of each time group in sorted *starts*, followed by ``len(starts)``."""
+    n = len(starts)
+    # A gap above threshold to the previous note always opens a new group,
+    # so only runs of closely spaced notes need the per-note scan below.
+    breaks = (np.flatnonzero(np.diff(starts) > threshold) + 1).tolist()
+    run_bounds = [0] + breaks + [n]
+    bounds: List[int] = []
+    for lo, hi in zip(run_bounds[:-1], run_bounds[1:]):
+        bounds.append(lo)
+        if starts[hi - 1] - starts[lo] <= threshold:
+            continue
+        group_start = starts[lo]
+        for i in range(lo + 1, hi):
+            if starts[i] - group_start > threshold:
+                bounds.append(i)
+                group_start = starts[i]
+    bounds.append(n)
+    return bounds
+
 
 def get_time_groups(notes: List[Note], threshold: float = 0.015) -> List[List[Note]]:
-    """Group notes whose start times are within *threshold* seconds of each other."""
+    """Group notes (sorted by start) whose start times are within *threshold* seconds of the group's first note."""
     if not notes:
         return []
-    groups: List[List[Note]] = []
-    current = [notes[0]]
-    for i in range(1, len(notes)):
-        if notes[i].start_time - current[0].start_time <= threshold:
-            current.append(notes[i])
-        else:
-            groups.append(current)
-            current = [notes[i]]
-    groups.append(current)
-    return groups
+    bounds = _group_bounds([n.start_time for n in notes], threshold)
+    return [notes[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
 
 
 # ---------------------------------------------------------------------------
@@ -41,6 +61,10 @@ class TempoMap:
         self.time_signatures = sorted(time_signatures, key=lambda x: x[0])
         self._segments: List[Tuple[float, float, int]] = []
         self._build_segments()
+        # Time-signature lookup keys for get_measure_boundaries.
+        self._ts_list = self.time_signatures if self.time_signatures else [(0.0, 4, 4)]
+        self._ts_times = [ts[0] for ts in self._ts_list]
+        self._ts_beats = [self.time_to_beat(t) for t in self._ts_times]
         self.has_explicit_time_signatures = (
             len(time_signatures) > 0
             and not (len(time_signatures) == 1
@@ -60,42 +84,92 @@ class TempoMap:
             self._segments.append((t, beat, new_tempo))
             last_t = t
             tempo = new_tempo
+        # Segment keys are fixed after construction; cache them for bisect
+        # (scalar lookups) and as arrays (batch lookups).
+        self._seg_time_keys = [s[0] for s in self._segments]
+        self._seg_beat_keys = [s[1] for s in self._segments]
+        self._seg_times = np.array(self._seg_time_keys, dtype=np.float64)
+        self._seg_beats = np.array(self._seg_beat_keys, dtype=np.float64)
+        self._seg_tempos = np.array([s[2] for s in self._segments], dtype=np.int64)
+        self._seg_spb = self._seg_tempos / 1_000_000.0
+        # Seconds per beat per segment. time -> beat still divides by it: multiplying
+        # by the reciprocal rounds grid-aligned times off whole beats.
+        self._seg_spb_keys = self._seg_spb.tolist()
 
     def time_to_beat(self, t: float) -> float:
-        idx = bisect.bisect_right([s[0] for s in self._segments], t) - 1
+        idx = bisect.bisect_right(self._seg_time_keys, t) - 1
         if idx < 0:
             return 0.0
-        st, sb, tempo = self._segments[idx]
-        return sb + (t - st) / (tempo / 1_000_000.0)
+        return self._seg_beat_keys[idx] + (t - self._seg_time_keys[idx]) / self._seg_spb_keys[idx]
 
     def beat_to_time(self, b: float) -> float:
-        idx = bisect.bisect_right([s[1] for s in self._segments], b) - 1
+        idx = bisect.bisect_right(self._seg_beat_keys, b) - 1
         if idx < 0:
             return 0.0
-        st, sb, tempo = self._segments[idx]
-        return st + (b - sb) * (tempo / 1_000_000.0)
+        return self._seg_time_keys[idx] + (b - self._seg_beat_keys[idx]) * self._seg_spb_keys[idx]
+
+    def times_to_beats(self, ts: np.ndarray) -> np.ndarray:
+        """Vectorized :meth:`time_to_beat` for an array of times."""
+        ts = np.asarray(ts, dtype=np.float64)
+        idx = np.searchsorted(self._seg_times, ts, side='right') - 1
+        safe = np.maximum(idx, 0)
+        out = self._seg_beats[safe] + (ts - self._seg_times[safe]) / self._seg_spb[safe]
+        return np.where(idx < 0, 0.0, out)
+
+    def beats_to_times(self, bs: np.ndarray) -> np.ndarray:
+        """Vectorized :meth:`beat_to_time` for an array of beats."""
+        bs = np.asarray(bs, dtype=np.float64)
+        idx = np.searchsorted(self._seg_beats, bs, side='right') - 1
+        safe = np.maximum(idx, 0)
+        out = self._seg_times[safe] + (bs - self._seg_beats[safe]) * self._seg_spb[safe]
+        return np.where(idx < 0, 0.0, out)
 
     def get_tempo_at(self, time: float) -> int:
-        idx = bisect.bisect_right([e[0] for e in self.events], time) - 1
-        return self.events[idx][1] if idx >= 0 else 500_000
+        # Segments mirror self.events (plus a leading default when needed),
+        # so the segment tempo is the event tempo in effect at *time*.
+        idx = bisect.bisect_right(self._seg_time_keys, time) - 1
+        return self._segments[idx][2] if idx >= 0 else 500_000
+
+    def tempos_at(self, times: np.ndarray) -> np.ndarray:
+        """Vectorized :meth:`get_tempo_at` for an array of times."""
+        times = np.asarray(times, dtype=np.float64)
+        idx = np.searchsorted(self._seg_times, times, side='right') - 1
+        return np.where(idx < 0, 500_000, self._seg_tempos[np.maximum(idx, 0)])
+
+    def seconds_per_beat_at(self, times: np.ndarray) -> np.ndarray:
+        """Seconds per beat in effect at each time; same lookup as :meth:`tempos_at`."""
+        times = np.asarray(times, dtype=np.float64)
+        idx = np.searchsorted(self._seg_times, times, side='right') - 1
+        return np.where(idx < 0, 0.5, self._seg_spb[np.maximum(idx, 0)])
 
     def get_measure_boundaries(self, total_duration: float) -> List[Tuple[float, float]]:
-        ts_list = self.time_signatures if self.time_signatures else [(0.0, 4, 4)]
+        """(start, end) times of each measure; a time signature takes effect at the first measure starting at or after it."""
+        ts_list, ts_times, ts_beats = self._ts_list, self._ts_times, self._ts_beats
         total_beats = self.time_to_beat(total_duration)
-        measures: List[Tuple[float, float]] = []
+        runs: List[np.ndarray] = []   # Consecutive measure start times, ending with the last measure's end.
         beat = 0.0
+        t = self.beat_to_time(beat)
         while beat < total_beats:
-            t = self.beat_to_time(beat)
-            active = ts_list[0]
-            for ts in ts_list:
-                if ts[0] <= t + 0.001:
-                    active = ts
-                else:
-                    break
-            measure_beats = active[1] * (4.0 / active[2])
-            end_beat = beat + measure_beats
-            measures.append((t, self.beat_to_time(end_beat)))
-            beat = end_beat
+            k = max(bisect.bisect_right(ts_times, t + 0.001) - 1, 0)
+            measure_beats = ts_list[k][1] * (4.0 / ts_list[k][2])
+            has_next = k + 1 < len(ts_list)
+            limit = min(total_beats, ts_beats[k + 1]) if has_next else total_beats
+            n = max(int((limit - beat) / measure_beats), 0) + 2
+            # Accumulate one measure at a time so beats match repeated addition.
+            beats = np.add.accumulate(np.concatenate(([beat], np.full(n, measure_beats))))
+            times = self.beats_to_times(beats)
+            stop = min(int(np.searchsorted(beats, total_beats, side='left')), n)
+            if has_next:
+                switched = np.flatnonzero(ts_times[k + 1] <= times + 0.001)
+                if len(switched):
+                    stop = min(stop, int(switched[0]))
+            runs.append(times[:stop + 1])
+            beat = beats[stop]
+            t = times[stop]
+        measures: List[Tuple[float, float]] = []
+        for run in runs:
+            run = run.tolist()
+            measures.extend(zip(run[:-1], run[1:]))
         return measures
 
 
@@ -109,49 +183,88 @@ class GlobalTickMap:
         self._build(midi_file)
 
     def _build(self, midi_file: mido.MidiFile):
-        merged = mido.merge_tracks(midi_file.tracks)
+        # Only tempo / time-signature metas matter here: collect them per track
+        # (in tick order) and merge, instead of merging every message of the file.
+        meta_tracks = []
+        for ti, track in enumerate(midi_file.tracks):
+            abs_tick = 0
+            metas = []
+            for msg in track:
+                abs_tick += msg.time
+                if msg.type == 'set_tempo' or msg.type == 'time_signature':
+                    metas.append((abs_tick, ti, len(metas), msg))
+            meta_tracks.append(metas)
+
         t = 0.0
         tick = 0
         tempo = 500_000
         self._entries.append((0, 0.0, tempo))
-        acc = 0
-        for msg in merged:
-            acc += msg.time
-            dt = mido.tick2second(acc - tick, self.ticks_per_beat, tempo)
-            t += dt
-            tick = acc
+        for abs_tick, _, _, msg in heapq.merge(*meta_tracks):
+            t += mido.tick2second(abs_tick - tick, self.ticks_per_beat, tempo)
+            tick = abs_tick
             if msg.type == 'set_tempo':
                 tempo = msg.tempo
                 self._entries.append((tick, t, tempo))
-            elif msg.type == 'time_signature':
+            else:
                 self.time_signatures.append((t, msg.numerator, msg.denominator))
+        self._tick_keys = [e[0] for e in self._entries]
+        self._e_ticks = np.array(self._tick_keys, dtype=np.int64)
+        self._e_times = np.array([e[1] for e in self._entries], dtype=np.float64)
+        self._e_tempos = np.array([e[2] for e in self._entries], dtype=np.int64)
+        self._e_sec_per_tick = self._e_tempos * 1e-6 / self.ticks_per_beat   # Same factor as mido.tick2second.
+        self._e_sec_per_tick_keys = self._e_sec_per_tick.tolist()
 
     def tick_to_time(self, target_tick: int) -> float:
-        last_tick, last_time, tempo = self._entries[0]
-        for e_tick, e_time, e_tempo in self._entries:
-            if target_tick >= e_tick:
-                last_tick, last_time, tempo = e_tick, e_time, e_tempo
-            else:
-                break
-        return last_time + mido.tick2second(
-            target_tick - last_tick, self.ticks_per_beat, tempo)
+        idx = max(bisect.bisect_right(self._tick_keys, target_tick) - 1, 0)
+        last_tick, last_time, _ = self._entries[idx]
+        return last_time + (target_tick - last_tick) * self._e_sec_per_tick_keys[idx]
+
+    def ticks_to_times(self, ticks: np.ndarray) -> np.ndarray:
+        """Vectorized :meth:`tick_to_time` for an array of absolute ticks."""
+        ticks = np.asarray(ticks, dtype=np.int64)
+        idx = np.maximum(np.searchsorted(self._e_ticks, ticks, side='right') - 1, 0)
+        return self._e_times[idx] + (ticks - self._e_ticks[idx]) * self._e_sec_per_tick[idx]
 
 
 # ---------------------------------------------------------------------------
 # MIDI file parser
 # ---------------------------------------------------------------------------
 
+_PARSE_CACHE_SIZE = 8
+_PARSE_CACHE: "OrderedDict[Tuple[str, int, int, float], Tuple[List[MidiTrack], TempoMap]]" = OrderedDict()   # LRU order.
+
+
 class MidiParser:
     """Parse a MIDI file into :class:`MidiTrack` objects and a :class:`TempoMap`."""
 
     @staticmethod
     def parse_structure(filepath: str, tempo_scale: float = 1.0
                         ) -> Tuple[List[MidiTrack], TempoMap]:
+        """Parse *filepath*; results are cached per (path, mtime, size, tempo_scale) and shared, so callers copy notes before mutating them."""
+        try:
+            st = os.stat(filepath)
+            key = (os.path.abspath(filepath), st.st_mtime_ns, st.st_size, tempo_scale)
+        except OSError:
+            key = None
+        if key is not None and key in _PARSE_CACHE:
+            _PARSE_CACHE.move_to_end(key)
+            return _PARSE_CACHE[key]
+
         try:
             mid = mido.MidiFile(filepath)
         except Exception as e:
             raise IOError(f"Could not read MIDI file: {e}")
 
+        result = MidiParser._parse(mid, tempo_scale)
+        if key is not None:
+            _PARSE_CACHE[key] = result
+            if len(_PARSE_CACHE) > _PARSE_CACHE_SIZE:
+                _PARSE_CACHE.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _parse(mid: mido.MidiFile, tempo_scale: float
+               ) -> Tuple[List[MidiTrack], TempoMap]:
         gmap = GlobalTickMap(mid)
         tempo_map = TempoMap(
             [(entry[1], entry[2]) for entry in gmap._entries],
@@ -166,46 +279,69 @@ class MidiParser:
             program = 0
             is_drum = False
             notes: List[Note] = []
-            pedal_events: List[Tuple[float, int]] = []
-            open_notes: Dict[int, List[Dict]] = defaultdict(list)
+            # Closed notes as typed parallel buffers; ticks are converted to seconds in one batch.
+            start_ticks, end_ticks = array('q'), array('q')
+            pitches, velocities, channels = array('B'), array('B'), array('B')
+            pedal_ticks, pedal_values = array('q'), array('B')
+            open_notes: List[Deque[Tuple[int, int]]] = [deque() for _ in range(128)]   # Indexed by pitch; (tick, vel) FIFO.
             abs_tick = 0
 
             for msg in track:
                 abs_tick += msg.time
-                if msg.type == 'track_name':
-                    name = msg.name
-                if msg.type == 'program_change':
+                # One type read per message, most frequent types first.
+                mtype = msg.type
+                if mtype == 'note_on' and msg.velocity > 0:
+                    open_notes[msg.note].append((abs_tick, msg.velocity))
+                elif mtype == 'note_off' or mtype == 'note_on':
+                    pending = open_notes[msg.note]
+                    if pending:
+                        start_tick, vel = pending.popleft()
+                        start_ticks.append(start_tick)
+                        end_ticks.append(abs_tick)
+                        pitches.append(msg.note)
+                        velocities.append(vel)
+                        channels.append(msg.channel)
+                elif mtype == 'control_change':
+                    if msg.control == 64:
+                        pedal_ticks.append(abs_tick)
+                        pedal_values.append(msg.value)
+                elif mtype == 'program_change':
                     program = msg.program
                     if msg.channel == 9:
                         is_drum = True
+                elif mtype == 'track_name':
+                    name = msg.name
+
+            if start_ticks:
+                starts = gmap.ticks_to_times(np.frombuffer(start_ticks, dtype=np.int64))
+                durs = gmap.ticks_to_times(np.frombuffer(end_ticks, dtype=np.int64)) - starts
+                keep = np.flatnonzero(durs > 0.01)
+                kept_channels = np.frombuffer(channels, dtype=np.uint8)[keep]
+                if (kept_channels == 9).any():
+                    is_drum = True
+                note_starts = starts[keep] / tempo_scale
+                notes = [
+                    Note(nid, pitch, vel, s, dur, 'unknown', i, channel)
+                    for nid, pitch, vel, s, dur, channel in zip(
+                        range(note_id, note_id + len(keep)),
+                        np.frombuffer(pitches, dtype=np.uint8)[keep].tolist(),
+                        np.frombuffer(velocities, dtype=np.uint8)[keep].tolist(),
+                        note_starts.tolist(),
+                        (durs[keep] / tempo_scale).tolist(),
+                        kept_channels.tolist(),
+                    )
+                ]
+                note_id += len(notes)
+                # Notes close in note-off order; only sort when that broke start order.
+                if (note_starts[1:] < note_starts[:-1]).any():
+                    notes.sort(key=_START_TIME)
+            pedal_events: List[Tuple[float, int]] = []
+            if pedal_ticks:
+                pedal_times = gmap.ticks_to_times(np.frombuffer(pedal_ticks, dtype=np.int64)).tolist()
+                pedal_events = [(t / tempo_scale, value) for t, value
+                                in zip(pedal_times, pedal_values)]
 
-                if msg.type == 'note_on' and msg.velocity > 0:
-                    open_notes[msg.note].append(
-                        {'tick': abs_tick, 'vel': msg.velocity})
-                elif (msg.type == 'note_off'
-                      or (msg.type == 'note_on' and msg.velocity == 0)):
-                    if open_notes[msg.note]:
-                        nd = open_notes[msg.note].pop(0)
-                        s = gmap.tick_to_time(nd['tick'])
-                        e = gmap.tick_to_time(abs_tick)
-                        dur = e - s
-                        if dur > 0.01:
-                            notes.append(Note(
-                                note_id, msg.note, nd['vel'],
-                                s / tempo_scale, dur / tempo_scale,
-                                'unknown', i, msg.channel,
-                            ))
-                            note_id += 1
-
-                if (msg.type == 'control_change'
-                        and msg.control == 64):
-                    t = gmap.tick_to_time(abs_tick) / tempo_scale
-                    pedal_events.append((t, msg.value))
-
-            if any(n.channel == 9 for n in notes):
-                is_drum = True
             if notes:
-                notes.sort(key=lambda n: n.start_time)
                 tracks.append(MidiTrack(i, name, program, is_drum, notes,
                                         pedal_events))
 
@@ -216,6 +352,11 @@ class MidiParser:
 # Key mapping  (game-defined tables — DO NOT CHANGE the mapping constants)
 # ---------------------------------------------------------------------------
 
+_BLACK_KEY_MASK = 0b010101001010   # Bits 1, 3, 6, 8, 10: black-key semitones (mod 12).
+_PITCH_NAMES = ("C", "C#", "D", "D#", "E", "F",
+                "F#", "G", "G#", "A", "A#", "B")
+
+
 class KeyMapper:
     """Map a MIDI pitch to the Roblox piano keyboard key + modifier combination.
 
@@ -241,55 +382,67 @@ class KeyMapper:
         self.use_88_key_layout = use_88_key_layout
         self.min_pitch = 21 if use_88_key_layout else 36
         self.max_pitch = 108 if use_88_key_layout else 96
-        self.key_map: Dict[int, Dict] = {}
+        self.key_map: List[Optional[Tuple[str, tuple]]] = [None] * 128   # pitch -> (key, modifiers)
         self._build()
+        # Per-pitch lookup tables for the MIDI range, with octave folding applied.
+        self._lut: List[Optional[Tuple[str, tuple]]] = [
+            self.key_map[self._fold_pitch(p)] for p in range(128)]
+        self._lut_keys: List[Optional[str]] = [
+            d[0] if d else None for d in self._lut]
 
     def _build(self):
         if self.use_88_key_layout:
             p = self.PITCH_START_LEFT
             for ch in self.LEFT_CTRL_KEYS:
-                self.key_map[p] = {'key': ch, 'modifiers': [Key.ctrl]}
+                self.key_map[p] = (ch, (Key.ctrl,))
                 p += 1
             p = self.PITCH_START_RIGHT
             for ch in self.RIGHT_CTRL_KEYS:
-                self.key_map[p] = {'key': ch, 'modifiers': [Key.ctrl]}
+                self.key_map[p] = (ch, (Key.ctrl,))
                 p += 1
 
         wi = 0
         p = self.PITCH_START_MIDDLE
         while p <= 108 and wi < len(self.MIDDLE_WHITE_KEYS):
             ch = self.MIDDLE_WHITE_KEYS[wi]
-            if p not in self.key_map:
-                self.key_map[p] = {'key': ch, 'modifiers': []}
+            if self.key_map[p] is None:
+                self.key_map[p] = (ch, ())
             nxt = p + 1
             if self.is_black_key(nxt):
-                if nxt not in self.key_map:
-                    self.key_map[nxt] = {'key': ch, 'modifiers': [Key.shift]}
+                if self.key_map[nxt] is None:
+                    self.key_map[nxt] = (ch, (Key.shift,))
                 p += 2
             else:
                 p += 1
             wi += 1
 
-    def get_key_data(self, pitch: int) -> Optional[Dict]:
-        while pitch < self.min_pitch:
-            pitch += 12
-        while pitch > self.max_pitch:
-            pitch -= 12
-        return self.key_map.get(pitch)
+    def _fold_pitch(self, pitch: int) -> int:
+        """Shift *pitch* by octaves into [min_pitch, max_pitch]."""
+        if pitch < self.min_pitch:
+            pitch += (self.min_pitch - pitch + 11) // 12 * 12
+        if pitch > self.max_pitch:
+            pitch -= (pitch - self.max_pitch + 11) // 12 * 12
+        return pitch
+
+    def get_key_data(self, pitch: int) -> Optional[Tuple[str, tuple]]:
+        """``(key, modifiers)`` for *pitch* after octave folding, or None if unmapped."""
+        if 0 <= pitch < 128:
+            return self._lut[pitch]
+        return self.key_map[self._fold_pitch(pitch)]
 
     def get_key_for_pitch(self, pitch: int) -> Optional[str]:
+        if 0 <= pitch < 128:
+            return self._lut_keys[pitch]
         data = self.get_key_data(pitch)
-        return data['key'] if data else None
+        return data[0] if data else None
 
     @staticmethod
     def is_black_key(pitch: int) -> bool:
-        return (pitch % 12) in {1, 3, 6, 8, 10}
+        return ((_BLACK_KEY_MASK >> (pitch % 12)) & 1) == 1
 
     @staticmethod
     def pitch_to_name(pitch: int) -> str:
-        names = ["C", "C#", "D", "D#", "E", "F",
-                 "F#", "G", "G#", "A", "A#", "B"]
-        return f"{names[pitch % 12]}{(pitch // 12) - 1}"
+        return f"{_PITCH_NAMES[pitch % 12]}{(pitch // 12) - 1}"
 
     @property
     def lower_ctrl_bound(self):
@@ -5,8 +5,10 @@ import sys
 import os
 import re
 import json
-import copy
 import threading
+from operator import attrgetter, itemgetter
+from collections import OrderedDict, deque
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from pynput import keyboard
@@ -17,16 +19,15 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QH
                              QMessageBox, QGridLayout, QStatusBar, QDialog, QTableWidget,
                              QTableWidgetItem, QHeaderView, QAbstractItemView, QDialogButtonBox,
                              QSizePolicy, QScrollArea, QRadioButton)
-from PyQt6.QtCore import QObject, QThread, QByteArray, pyqtSignal as Signal, Qt
+from PyQt6.QtCore import QObject, QThread, QTimer, QByteArray, pyqtSignal as Signal, Qt
 from PyQt6.QtGui import QFont, QIcon
 from PyQt6.QtWidgets import QTextBrowser
 import mido
+import numpy as np
 
 from models import Note, MidiTrack
 from core import MidiParser
-from analysis import SectionAnalyzer, FingeringEngine
 from visualizer import PianoWidget, TimelineWidget
-from player import Player, EventCompiler
 from output import create_backend
 
 APP_NAME = "Jukebox"
@@ -35,6 +36,32 @@ APP_URL = "https://github.com/x15rte/Jukebox"
 CONFIG_DIR_NAME = ".jukebox_piano"
 CONFIG_FILENAME = "config.json"
 LOG_FILENAME = "log.txt"
+_START_TIME = attrgetter('start_time')   # Sort key for notes.
+PREP_CACHE_SIZE = 4   # Prepared note sets kept for replay (see _prepare_notes).
+
+# Pedal style combo: display text -> internal style, in combo order.
+PEDAL_STYLE_MAP = {
+    "Original (from MIDI)": "original",
+    "Automatic": "hybrid",
+    "Always Sustain": "legato",
+    "Rhythmic Only": "rhythmic",
+    "No Pedal": "none"
+}
+PEDAL_STYLE_NAMES = {v: k for k, v in PEDAL_STYLE_MAP.items()}
+PEDAL_STYLES = tuple(PEDAL_STYLE_MAP.values())
+
+# Track role (TrackSelectionDialog) -> forced Note.hand; other roles keep the note's own hand.
+ROLE_HANDS = {"Left Hand": 'left', "Right Hand": 'right'}
+
+# Humanization slider rows: (key, label, min, max, default, suffix, factor, decimals,
+# config.json enable key, config.json value key).
+HUMANIZATION_ROWS = (
+    ('vary_timing', "Vary Timing", 0, 0.1, 0.010, " s", 10000.0, 3, 'enable_vary_timing', 'value_timing_variance'),
+    ('vary_articulation', "Vary Articulation", 50, 100, 95.0, "%", 100.0, 1, 'enable_vary_articulation', 'value_articulation'),
+    ('hand_drift', "Hand Drift", 0, 100, 25.0, "%", 100.0, 1, 'enable_hand_drift', 'value_hand_drift_decay'),
+    ('mistake_chance', "Mistake Chance", 0, 10, 0.5, "%", 100.0, 1, 'enable_mistakes', 'value_mistake_chance'),
+    ('tempo_sway', "Tempo Sway", 0, 0.1, 0.015, " s", 10000.0, 3, 'enable_tempo_sway', 'value_tempo_sway_intensity'),
+)
 
 
 def _get_git_version() -> str:
@@ -56,6 +83,19 @@ def _get_git_version() -> str:
 APP_VERSION = _get_git_version()
 
 
+_config_write_lock = threading.Lock()
+
+
+def _write_config_file(path: Path, payload: str):
+    """Write *payload* to a temp file next to *path*, then swap it in so readers never see a partial file."""
+    tmp = path.with_suffix('.tmp')
+    try:
+        with _config_write_lock:
+            tmp.write_text(payload, encoding='utf-8')
+            os.replace(tmp, path)
+    except Exception as e: print(f"Error saving config: {e}")
+
+
 def _parse_hotkey_string(s: str):
     """Parse config string to pynput Key or KeyCode (special key name or single char); default Key.f6."""
     if not s or not isinstance(s, str):
@@ -72,8 +112,59 @@ def _parse_hotkey_string(s: str):
     return Key.f6
 
 
+@dataclass(frozen=True, slots=True)
+class PlaybackSettings:
+    """One read of the playback/humanization controls; percentages are kept as shown in the UI."""
+    tempo: float
+    output_mode: str
+    pedal_style: str
+    use_88_key_layout: bool
+    countdown: bool
+    simulate_hands: bool
+    enable_chord_roll: bool
+    vary_timing: bool
+    timing_variance: float
+    vary_articulation: bool
+    articulation_pct: float
+    enable_drift_correction: bool
+    drift_decay_pct: float
+    enable_mistakes: bool
+    mistake_chance: float
+    enable_tempo_sway: bool
+    tempo_sway_intensity: float
+    invert_tempo_sway: bool
+
+    def to_player_config(self, midi_file: str) -> dict:
+        """Config dict for handle_play / Player (which adds raw_pedal_events and start_offset)."""
+        return {
+            'midi_file': midi_file,
+            'tempo': self.tempo,
+            'countdown': self.countdown,
+            'use_88_key_layout': self.use_88_key_layout,
+            'pedal_style': self.pedal_style,
+            'output_mode': self.output_mode,
+            'simulate_hands': self.simulate_hands,
+            'vary_velocity': False,
+            'enable_chord_roll': self.enable_chord_roll,
+            'vary_timing': self.vary_timing,
+            'timing_variance': self.timing_variance,
+            'vary_articulation': self.vary_articulation,
+            'articulation': self.articulation_pct / 100.0,
+            'enable_drift_correction': self.enable_drift_correction,
+            'drift_decay_factor': self.drift_decay_pct / 100.0,
+            'enable_mistakes': self.enable_mistakes,
+            'mistake_chance': self.mistake_chance,
+            'enable_tempo_sway': self.enable_tempo_sway,
+            'tempo_sway_intensity': self.tempo_sway_intensity,
+            'invert_tempo_sway': self.invert_tempo_sway,
+        }
+
+
 class HotkeyManager(QObject):
-    """Global hotkey listener: current_key triggers toggle; start_binding() captures next key and emits bound_updated."""
+    """Global hotkey listener: current_key triggers toggle; start_binding() captures next key and emits bound_updated.
+
+    The pynput thread only queues key presses; a UI-thread timer drains the queue at ~30 Hz.
+    """
     toggle_requested = Signal()
     bound_updated = Signal(str)
 
@@ -82,8 +173,21 @@ class HotkeyManager(QObject):
         self.current_key = Key.f6
         self.listener = None
         self.listening_for_bind = False
+        self._pressed = deque(maxlen=32)   # deque.append is atomic; safe from the listener thread.
+        self._drain_timer = QTimer(self)
+        self._drain_timer.timeout.connect(self._drain_presses)
+        self._drain_timer.start(33)
         self._start_listener()
 
+    @property
+    def current_key(self):
+        return self._current_key
+
+    @current_key.setter
+    def current_key(self, key):
+        self._current_key = key
+        self.current_key_str = self._format_key_string(key)   # Display text, refreshed only on rebind.
+
     def _start_listener(self):
         self.listener = keyboard.Listener(on_press=self.on_press)
         self.listener.start()
@@ -94,13 +198,18 @@ class HotkeyManager(QObject):
         return str(key).replace('Key.', '')
 
     def on_press(self, key):
-        if self.listening_for_bind:
-            self.current_key = key
-            self.listening_for_bind = False
-            self.bound_updated.emit(self._format_key_string(key))
-            return
-        if key == self.current_key:
-            self.toggle_requested.emit()
+        self._pressed.append(key)
+
+    def _drain_presses(self):
+        pressed = self._pressed
+        while pressed:
+            key = pressed.popleft()
+            if self.listening_for_bind:
+                self.current_key = key
+                self.listening_for_bind = False
+                self.bound_updated.emit(self.current_key_str)
+            elif key == self.current_key:
+                self.toggle_requested.emit()
 
     def start_binding(self):
         self.listening_for_bind = True
@@ -132,6 +241,9 @@ class TrackSelectionDialog(QDialog):
         self.checkboxes = []
         self.role_combos = []
 
+        # Fill all rows before the table repaints or emits change signals.
+        self.table.setUpdatesEnabled(False)
+        self.table.blockSignals(True)
         for i, track in enumerate(self.tracks):
             check_item = QTableWidgetItem()
             check_item.setFlags(Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled)
@@ -146,6 +258,8 @@ class TrackSelectionDialog(QDialog):
             combo.addItems(["Auto-Detect", "Left Hand", "Right Hand"])
             self.table.setCellWidget(i, 4, combo)
             self.role_combos.append(combo)
+        self.table.blockSignals(False)
+        self.table.setUpdatesEnabled(True)
 
         buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         buttons.accepted.connect(self.accept)
@@ -209,42 +323,163 @@ class MidiInputWorker(QObject):
         self.finished.emit()
 
 
+class MidiParseWorker(QObject):
+    """Parses a MIDI file on a background thread so the UI stays responsive."""
+    parsed = Signal(object, object)   # (tracks, tempo_map)
+    parse_error = Signal(str)
+    finished = Signal()
+
+    def __init__(self, filepath):
+        super().__init__()
+        self._filepath = filepath
+
+    def run(self):
+        try:
+            tracks, tempo_map = MidiParser.parse_structure(self._filepath, 1.0)
+        except Exception as e:
+            self.parse_error.emit(str(e))
+        else:
+            self.parsed.emit(tracks, tempo_map)
+        finally:
+            self.finished.emit()
+
+
+def _prepare_notes(config, selected_tracks_info, cache, log):
+    """Copy, hand-assign and analyze the selected tracks' notes; runs on NotePrepWorker's thread.
+
+    Returns (final_notes, sections, tempo_map, raw_pedal_events). Results are cached in *cache* per
+    (file, mtime, size, tempo, track roles, simulate_hands) and shared, so callers must not mutate them.
+    """
+    from analysis import SectionAnalyzer, FingeringEngine
+    tempo_scale = config['tempo'] / 100.0
+    simulate_hands = config['simulate_hands']
+    role_map = {t.index: r for t, r in selected_tracks_info}
+    try:
+        st = os.stat(config['midi_file'])
+        key = (os.path.abspath(config['midi_file']), st.st_mtime_ns, st.st_size, tempo_scale,
+               tuple(sorted(role_map.items())), simulate_hands)
+    except OSError:
+        key = None
+    if key is not None and key in cache:
+        cache.move_to_end(key)
+        log("Reusing prepared notes for unchanged file and settings.")
+        return cache[key]
+
+    tracks, tempo_map = MidiParser.parse_structure(config['midi_file'], tempo_scale)
+    final_notes = []
+    raw_pedal_events = []
+    for track in tracks:
+        raw_pedal_events.extend(track.pedal_events)
+        role = role_map.get(track.index)
+        if role is None: continue
+        hand = ROLE_HANDS.get(role)
+        if hand: final_notes.extend(note.copy(hand) for note in track.notes)
+        elif simulate_hands: final_notes.extend(note.copy() for note in track.notes)
+        else:   # Split at middle C while copying instead of a second pass.
+            final_notes.extend(note.copy('left' if note.pitch < 60 else 'right')
+                               for note in track.notes)
+    raw_pedal_events.sort(key=itemgetter(0))
+
+    final_notes.sort(key=_START_TIME)
+    if simulate_hands:
+        log("Simulating hands for unassigned notes...")
+        engine = FingeringEngine()
+        engine.assign_hands(final_notes)
+
+    log("Analyzing musical structure...")
+    analyzer = SectionAnalyzer(final_notes, tempo_map)
+    sections = analyzer.analyze()
+
+    result = (final_notes, sections, tempo_map, raw_pedal_events)
+    if key is not None:
+        cache[key] = result
+        if len(cache) > PREP_CACHE_SIZE:
+            cache.popitem(last=False)
+    return result
+
+
+class NotePrepWorker(QObject):
+    """Runs _prepare_notes and EventCompiler.compile on a background thread so pressing Play does not freeze the UI."""
+    prepared = Signal(object, object, object)   # (final_notes, tempo_map, compiled_events)
+    prep_error = Signal(str)
+    status = Signal(str)
+    finished = Signal()
+
+    def __init__(self, config, selected_tracks_info, cache):
+        super().__init__()
+        self._config = config
+        self._selected_tracks_info = selected_tracks_info
+        self._cache = cache
+
+    def run(self):
+        from player import EventCompiler
+        try:
+            final_notes, sections, tempo_map, raw_pedal_events = _prepare_notes(
+                self._config, self._selected_tracks_info, self._cache, self.status.emit)
+            self._config['raw_pedal_events'] = raw_pedal_events
+            compiled_events = EventCompiler.compile(final_notes, sections, self._config)
+        except Exception as e:
+            self.prep_error.emit(str(e))
+        else:
+            self.prepared.emit(final_notes, tempo_map, compiled_events)
+        finally:
+            self.finished.emit()
+
+
 class MainWindow(QMainWindow):
     """Tabs: Playback (file, tracks, humanization), Visualizer (timeline + piano), Settings (hotkey, overlay), Output (log). Saves/loads config.json; optional log to file."""
+    player_start_requested = Signal()   # Queued to the current Player on player_thread.
 
     def __init__(self):
         super().__init__()
         self.setWindowTitle(f"{APP_NAME} ({APP_VERSION})" if APP_VERSION else APP_NAME)
         self.setMinimumSize(780, 520)
-        self.player_thread = None
-        self.player = None
+        self.player_thread = QThread()   # Lives for the whole session; each Player is moved onto it.
+        self.player_thread.start()
+        self.player = None   # Set while a song is playing or paused.
         self.midi_input_thread = None
         self.midi_input_worker = None
         self.midi_input_active = False
+        self.parse_thread = None
+        self.parse_worker = None
+        self.prep_thread = None
+        self.prep_worker = None
+        self._prep_config = None
+        self._closing = False
         self.config_dir = Path.home() / CONFIG_DIR_NAME
         self.config_path = self.config_dir / CONFIG_FILENAME
         self.config_dir.mkdir(exist_ok=True)
         self.selected_tracks_info = None 
         self.parsed_tempo_map = None
-        self.current_notes = [] 
+        self._set_current_notes([])
         self.total_song_duration_sec = 1.0
+        self._last_scrub_time = 0.0
+        self._time_label_key = None
+        self._pending_progress = None
+        self._progress_timer = QTimer(self)
+        self._progress_timer.setInterval(33)
+        self._progress_timer.timeout.connect(self._flush_progress)
+        self._prep_cache = OrderedDict()   # _prepare_notes results, LRU order.
+        self._pending_log = []   # Stamped messages waiting for _flush_log.
+        self._log_timer = QTimer(self)
+        self._log_timer.setSingleShot(True)
+        self._log_timer.setInterval(100)
+        self._log_timer.timeout.connect(self._flush_log)
         
         self.hotkey_manager = HotkeyManager()
         self.hotkey_manager.toggle_requested.connect(self.toggle_playback_state)
         self.hotkey_manager.bound_updated.connect(self._on_hotkey_bound)
         
-        self.pedal_mapping = {
-            "Original (from MIDI)": "original",
-            "Automatic": "hybrid",
-            "Always Sustain": "legato",
-            "Rhythmic Only": "rhythmic",
-            "No Pedal": "none"
-        }
-        self.pedal_mapping_inv = {v: k for k, v in self.pedal_mapping.items()}
+        self._pedal_style = 'hybrid'   # Kept in sync with pedal_style_combo.
 
         self.live_backend = None
 
         self._setup_ui()
+        self._control_groups = self.findChildren(QGroupBox)   # Fixed after setup; toggled on play/stop.
+        # (check, spinbox, default, enable key, value key) per HUMANIZATION_ROWS entry, for config save/load.
+        self._humanization_row_widgets = tuple(
+            (self.all_humanization_checks[key], self.all_humanization_spinboxes[key], def_val, enable_key, value_key)
+            for key, _, _, _, def_val, _, _, _, enable_key, value_key in HUMANIZATION_ROWS)
         self._load_config()
         self.use_88_key_check.toggled.connect(self._on_key_layout_changed)
 
@@ -275,7 +510,7 @@ class MainWindow(QMainWindow):
         
         self.timeline_widget = TimelineWidget()
         self.timeline_widget.seek_requested.connect(self._on_timeline_seek)
-        self.timeline_widget.scrub_position_changed.connect(self._on_visual_scrub)
+        self.timeline_widget.scrub_position_changed.connect(self._on_timeline_scrub)
         
         self.scroll_area.setWidget(self.timeline_widget)
         vis_layout.addWidget(self.scroll_area)
@@ -368,7 +603,7 @@ class MainWindow(QMainWindow):
         self._update_play_stop_labels()
 
     def _update_play_stop_labels(self):
-        key_str = self.hotkey_manager._format_key_string(self.hotkey_manager.current_key)
+        key_str = self.hotkey_manager.current_key_str
         if not self.player: self.play_button.setText(f"Play ({key_str})")
         self.stop_button.setText(f"Stop")
 
@@ -376,7 +611,7 @@ class MainWindow(QMainWindow):
         if self.player and self.player.pause_event.is_set(): pass 
         else: self.piano_widget.clear()
 
-        if self.player_thread and self.player_thread.isRunning():
+        if self.player:
             self.player.toggle_pause()
             self._update_pause_ui_state()
             if not self.player.pause_event.is_set():
@@ -386,7 +621,7 @@ class MainWindow(QMainWindow):
             self.handle_play()
 
     def _update_pause_ui_state(self):
-        key_str = self.hotkey_manager._format_key_string(self.hotkey_manager.current_key)
+        key_str = self.hotkey_manager.current_key_str
         if self.player and self.player.pause_event.is_set():
             self.play_button.setText(f"Resume ({key_str})")
         else:
@@ -401,19 +636,54 @@ class MainWindow(QMainWindow):
         self.add_log_message(f"Seeking to {time:.2f}s...")
         if self.player: self.player.seek(time)
     
+    def _set_current_notes(self, notes):
+        """Set current_notes (sorted by start) and the start/end/pitch arrays used for scrub lookups.
+
+        Returns the latest note end (1.0 when empty), taken from the same arrays.
+        """
+        count = len(notes)
+        starts = np.fromiter((n.start_time for n in notes), dtype=np.float64, count=count)
+        durs = np.fromiter((n.duration for n in notes), dtype=np.float64, count=count)
+        pitches = np.fromiter((n.pitch for n in notes), dtype=np.int16, count=count)
+        ends = starts + durs
+        max_dur = float(durs.max()) if count else 0.0
+        # Build everything first, then swap both references in one statement.
+        self.current_notes, self._scrub_index = notes, (starts, ends, pitches, max_dur)
+        return float(ends.max()) if count else 1.0
+
+    def _on_timeline_scrub(self, time):
+        """Drag handler: skip positions less than half a pixel from the last scrub."""
+        px_per_sec = self.timeline_widget.width() / max(self.total_song_duration_sec, 0.1)
+        if abs(time - self._last_scrub_time) * px_per_sec < 0.5: return
+        self._on_visual_scrub(time)
+
     def _on_visual_scrub(self, time):
-        active_pitches = set()
-        for note in self.current_notes:
-            if note.start_time <= time < note.end_time: active_pitches.add(note.pitch)
+        self._last_scrub_time = time
+        starts, ends, pitches, max_dur = self._scrub_index
+        # Only notes starting within the longest duration before *time* can still be sounding.
+        lo = np.searchsorted(starts, time - max_dur - 1e-6, side='left')
+        hi = np.searchsorted(starts, time, side='right')
+        window = slice(lo, hi)
+        active_pitches = set(pitches[window][ends[window] > time].tolist())
         self.piano_widget.set_active_pitches(active_pitches)
         self._update_time_label(time, self.total_song_duration_sec)
 
     def update_progress(self, current_time):
+        """Record the latest playback time; _flush_progress draws it at most ~30 times a second."""
+        self._pending_progress = current_time
+        if not self._progress_timer.isActive():
+            self._progress_timer.start()
+
+    def _flush_progress(self):
+        current_time = self._pending_progress
+        if current_time is None:
+            self._progress_timer.stop()
+            return
+        self._pending_progress = None
         if self.player and self.player.total_duration > 0:
             self.total_song_duration_sec = self.player.total_duration
         if not self.timeline_widget.is_dragging:
             self.timeline_widget.set_position(current_time)
-            self.piano_widget.update()
             self._update_time_label(current_time, self.total_song_duration_sec)
             timeline_width = self.timeline_widget.width()
             scroll_width = self.scroll_area.width()
@@ -424,12 +694,17 @@ class MainWindow(QMainWindow):
                 self.scroll_area.horizontalScrollBar().setValue(int(target_scroll))
 
     def _update_time_label(self, current, total):
+        # The label only shows whole seconds; skip the format and relayout until one changes.
+        key = (current // 1, total // 1)
+        if key == self._time_label_key: return
+        self._time_label_key = key
         def fmt(s):
             m = int(s // 60); sec = int(s % 60)
             return f"{m:02d}:{sec:02d}"
         self.time_label.setText(f"{fmt(current)} / {fmt(total)}")
 
     def _copy_log_to_clipboard(self):
+        self._flush_log()
         clipboard = QApplication.clipboard()
         clipboard.setText(self.log_output.toPlainText())
         self.statusBar().showMessage("Log copied to clipboard!", 2000)
@@ -445,13 +720,22 @@ class MainWindow(QMainWindow):
         slider.setRange(int(min_val * factor), int(max_val * factor))
         spinbox = QDoubleSpinBox()
         spinbox.setDecimals(decimals)
-        spinbox.setRange(0.0, 9999.9999)
+        spinbox.setRange(min_val, max_val)   # The slider no longer echoes back, so the spinbox clamps itself.
         spinbox.setSingleStep(1.0 / factor)
         spinbox.setSuffix(text_suffix)
         slider.setValue(int(default_val * factor))
         spinbox.setValue(default_val)
-        slider.valueChanged.connect(lambda v: spinbox.setValue(v / factor))
-        spinbox.valueChanged.connect(lambda v: slider.setValue(int(v * factor)))
+        # Block the partner's signals while syncing so the update does not echo back.
+        def sync_spinbox(v):
+            spinbox.blockSignals(True)
+            spinbox.setValue(v / factor)
+            spinbox.blockSignals(False)
+        def sync_slider(v):
+            slider.blockSignals(True)
+            slider.setValue(int(v * factor))
+            slider.blockSignals(False)
+        slider.valueChanged.connect(sync_spinbox)
+        spinbox.valueChanged.connect(sync_slider)
         return slider, spinbox
 
     def _create_input_output_group(self):
@@ -475,10 +759,10 @@ class MainWindow(QMainWindow):
         file_layout = QVBoxLayout(self.file_input_widget)
         self.file_path_label = QLabel("No file selected.")
         self.file_path_label.setStyleSheet("font-style: italic; color: grey;")
-        browse_button = QPushButton("Browse for MIDI File")
-        browse_button.clicked.connect(self.select_file)
+        self.browse_button = QPushButton("Browse for MIDI File")
+        self.browse_button.clicked.connect(self.select_file)
         file_layout.addWidget(self.file_path_label)
-        file_layout.addWidget(browse_button)
+        file_layout.addWidget(self.browse_button)
         layout.addWidget(self.file_input_widget)
 
         self.piano_input_widget = QWidget()
@@ -559,7 +843,7 @@ class MainWindow(QMainWindow):
         if self.midi_input_active:
             return
 
-        if self.player_thread and self.player_thread.isRunning():
+        if self.player:
             self.handle_stop()
 
         port_name = self.midi_input_combo.currentText()
@@ -691,7 +975,8 @@ class MainWindow(QMainWindow):
 
         pedal_label = QLabel("Pedal Style")
         self.pedal_style_combo = QComboBox()
-        self.pedal_style_combo.addItems(list(self.pedal_mapping.keys()))
+        self.pedal_style_combo.currentIndexChanged.connect(self._on_pedal_style_changed)
+        self.pedal_style_combo.addItems(list(PEDAL_STYLE_MAP.keys()))
         self.pedal_style_combo.setItemData(0, "Uses sustain pedal data from the MIDI file. Falls back to Automatic if none found.", Qt.ItemDataRole.ToolTipRole)
         self.pedal_style_combo.setItemData(1, "Analyzes song sections to switch between Rhythmic and Sustain.", Qt.ItemDataRole.ToolTipRole)
         self.pedal_style_combo.setItemData(2, "Ignores note length. Holds pedal until harmony changes.", Qt.ItemDataRole.ToolTipRole)
@@ -713,7 +998,7 @@ class MainWindow(QMainWindow):
 
         hk_group = QGroupBox("Hotkey")
         hk_layout = QHBoxLayout(hk_group)
-        self.hk_label = QLabel(f"Start/Stop Hotkey: {self.hotkey_manager._format_key_string(self.hotkey_manager.current_key)}")
+        self.hk_label = QLabel(f"Start/Stop Hotkey: {self.hotkey_manager.current_key_str}")
         self.hk_btn = QPushButton("Change")
         self.hk_btn.clicked.connect(self._change_hotkey)
         hk_layout.addWidget(self.hk_label)
@@ -728,7 +1013,12 @@ class MainWindow(QMainWindow):
         self.opacity_slider = QSlider(Qt.Orientation.Horizontal)
         self.opacity_slider.setRange(20, 100)
         self.opacity_slider.setValue(100)
-        self.opacity_slider.valueChanged.connect(self._change_opacity)
+        # Apply opacity once the slider settles instead of on every step of a drag.
+        self._opacity_timer = QTimer(self)
+        self._opacity_timer.setSingleShot(True)
+        self._opacity_timer.setInterval(30)
+        self._opacity_timer.timeout.connect(lambda: self._change_opacity(self.opacity_slider.value()))
+        self.opacity_slider.valueChanged.connect(lambda _v: self._opacity_timer.start())
         ov_layout.addWidget(self.always_top_check, 0, 0, 1, 2)
         ov_layout.addWidget(opacity_label, 1, 0)
         ov_layout.addWidget(self.opacity_slider, 1, 1)
@@ -737,6 +1027,9 @@ class MainWindow(QMainWindow):
         self._reset_playback_group_to_default()
         return group
 
+    def _on_pedal_style_changed(self, index):
+        self._pedal_style = PEDAL_STYLES[index] if 0 <= index < len(PEDAL_STYLES) else 'hybrid'
+
     def _create_humanization_group(self):
         group = QGroupBox("Humanization")
         main_v_layout = QVBoxLayout(group)
@@ -757,7 +1050,7 @@ class MainWindow(QMainWindow):
         detailed_layout = QGridLayout()
         detailed_layout.setColumnStretch(2, 1) 
         
-        def add_detailed_row(row_idx, name, key, min_val, max_val, def_val, suffix, factor=1.0, decimals=3):
+        for row_idx, (key, name, min_val, max_val, def_val, suffix, factor, decimals, _, _) in enumerate(HUMANIZATION_ROWS):
             check = QCheckBox(name)
             slider, spinbox = self._create_slider_and_spinbox(min_val, max_val, def_val, suffix, factor=factor, decimals=decimals)
             check.toggled.connect(slider.setEnabled)
@@ -769,12 +1062,6 @@ class MainWindow(QMainWindow):
             self.all_humanization_sliders[key] = slider
             self.all_humanization_spinboxes[key] = spinbox
 
-        add_detailed_row(0, "Vary Timing", "vary_timing", 0, 0.1, 0.01, " s", factor=10000.0)
-        add_detailed_row(1, "Vary Articulation", "vary_articulation", 50, 100, 95, "%", factor=100.0, decimals=1)
-        add_detailed_row(2, "Hand Drift", "hand_drift", 0, 100, 25, "%", factor=100.0, decimals=1)
-        add_detailed_row(3, "Mistake Chance", "mistake_chance", 0, 10, 0, "%", factor=100.0, decimals=1)
-        add_detailed_row(4, "Tempo Sway", "tempo_sway", 0, 0.1, 0, " s", factor=10000.0)
-
         self.invert_sway_check = QCheckBox("Invert tempo sway")
         self.all_humanization_checks['invert_tempo_sway'] = self.invert_sway_check
         self.all_humanization_checks['tempo_sway'].toggled.connect(self.invert_sway_check.setEnabled)
@@ -800,11 +1087,8 @@ class MainWindow(QMainWindow):
         self.countdown_check.setChecked(True)
 
     def _reset_humanization_group_to_default(self):
-        self.all_humanization_spinboxes['vary_timing'].setValue(0.010)
-        self.all_humanization_spinboxes['vary_articulation'].setValue(95.0)
-        self.all_humanization_spinboxes['hand_drift'].setValue(25.0)
-        self.all_humanization_spinboxes['mistake_chance'].setValue(0.5)
-        self.all_humanization_spinboxes['tempo_sway'].setValue(0.015)
+        for key, _, _, _, def_val, *_ in HUMANIZATION_ROWS:
+            self.all_humanization_spinboxes[key].setValue(def_val)
         for check in self.all_humanization_checks.values(): 
             if check.text(): check.setChecked(False)
         self._update_enabled_states()
@@ -841,57 +1125,85 @@ class MainWindow(QMainWindow):
             self.add_log_message(f"Log is being saved to: {path}")
 
     def add_log_message(self, message):
-        """Append to log widget; optionally append plain text to log.txt in config dir."""
+        """Queue a stamped message; _flush_log appends the batch to the widget (and log.txt) every 100 ms."""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        stamped = f"[{timestamp}] {message}"
-        self.log_output.append(stamped)
+        self._pending_log.append(f"[{timestamp}] {message}")
+        if not self._log_timer.isActive():
+            self._log_timer.start()
+
+    def _flush_log(self):
+        pending, self._pending_log = self._pending_log, []
+        if not pending: return
+        # Messages may carry links, so keep the rich-text browser and append per message with one repaint.
+        self.log_output.setUpdatesEnabled(False)
+        for stamped in pending: self.log_output.append(stamped)
+        self.log_output.setUpdatesEnabled(True)
         if self.log_save_to_file_check.isChecked():
             path = self._get_log_file_path()
             try:
                 self.config_dir.mkdir(parents=True, exist_ok=True)
                 with open(path, "a", encoding="utf-8") as f:
-                    f.write(self._log_message_to_plain(stamped) + "\n")
+                    f.write("".join(self._log_message_to_plain(stamped) + "\n" for stamped in pending))
             except Exception:
                 pass
 
     def set_controls_enabled(self, enabled):
-        for groupbox in self.findChildren(QGroupBox): groupbox.setEnabled(enabled)
+        for groupbox in self._control_groups: groupbox.setEnabled(enabled)
+
+    def _read_playback_settings(self) -> PlaybackSettings:
+        """Read every playback/humanization control once; shared by gather_config and _save_config."""
+        checks = self.all_humanization_checks
+        spinboxes = self.all_humanization_spinboxes
+        return PlaybackSettings(
+            tempo=self.tempo_spinbox.value(),
+            output_mode=self._current_output_mode(),
+            pedal_style=self._pedal_style,
+            use_88_key_layout=self.use_88_key_check.isChecked(),
+            countdown=self.countdown_check.isChecked(),
+            simulate_hands=checks['simulate_hands'].isChecked(),
+            enable_chord_roll=checks['enable_chord_roll'].isChecked(),
+            vary_timing=checks['vary_timing'].isChecked(),
+            timing_variance=spinboxes['vary_timing'].value(),
+            vary_articulation=checks['vary_articulation'].isChecked(),
+            articulation_pct=spinboxes['vary_articulation'].value(),
+            enable_drift_correction=checks['hand_drift'].isChecked(),
+            drift_decay_pct=spinboxes['hand_drift'].value(),
+            enable_mistakes=checks['mistake_chance'].isChecked(),
+            mistake_chance=spinboxes['mistake_chance'].value(),
+            enable_tempo_sway=checks['tempo_sway'].isChecked(),
+            tempo_sway_intensity=spinboxes['tempo_sway'].value(),
+            invert_tempo_sway=checks['invert_tempo_sway'].isChecked(),
+        )
 
-    def _save_config(self):
-        """Persist UI state to config.json (humanization, hotkey, geometry, etc.)."""
-        display_text = self.pedal_style_combo.currentText()
-        internal_style = self.pedal_mapping.get(display_text, 'hybrid')
+    def _save_config(self, background: bool = False):
+        """Persist UI state to config.json (humanization, hotkey, geometry, etc.); the file write can run off the UI thread."""
+        settings = self._read_playback_settings()
         config = {
-            'tempo': self.tempo_spinbox.value(),
-            'output_mode': self._current_output_mode(),
-            'pedal_style': internal_style,
-            'use_88_key_layout': self.use_88_key_check.isChecked(),
-            'countdown': self.countdown_check.isChecked(),
+            'tempo': settings.tempo,
+            'output_mode': settings.output_mode,
+            'pedal_style': settings.pedal_style,
+            'use_88_key_layout': settings.use_88_key_layout,
+            'countdown': settings.countdown,
             'select_all_humanization': self.select_all_humanization_check.isChecked(),
-            'simulate_hands': self.all_humanization_checks['simulate_hands'].isChecked(),
-            'enable_chord_roll': self.all_humanization_checks['enable_chord_roll'].isChecked(),
-            'enable_vary_timing': self.all_humanization_checks['vary_timing'].isChecked(), 
-            'value_timing_variance': self.all_humanization_spinboxes['vary_timing'].value(),
-            'enable_vary_articulation': self.all_humanization_checks['vary_articulation'].isChecked(), 
-            'value_articulation': self.all_humanization_spinboxes['vary_articulation'].value(),
-            'enable_hand_drift': self.all_humanization_checks['hand_drift'].isChecked(), 
-            'value_hand_drift_decay': self.all_humanization_spinboxes['hand_drift'].value(),
-            'enable_mistakes': self.all_humanization_checks['mistake_chance'].isChecked(), 
-            'value_mistake_chance': self.all_humanization_spinboxes['mistake_chance'].value(),
-            'enable_tempo_sway': self.all_humanization_checks['tempo_sway'].isChecked(), 
-            'value_tempo_sway_intensity': self.all_humanization_spinboxes['tempo_sway'].value(),
-            'invert_tempo_sway': self.all_humanization_checks['invert_tempo_sway'].isChecked(),
+            'simulate_hands': settings.simulate_hands,
+            'enable_chord_roll': settings.enable_chord_roll,
+            'invert_tempo_sway': settings.invert_tempo_sway,
             'always_on_top': self.always_top_check.isChecked(),
             'opacity': self.opacity_slider.value(),
-            'hotkey': self.hotkey_manager._format_key_string(self.hotkey_manager.current_key),
+            'hotkey': self.hotkey_manager.current_key_str,
             'input_mode': 'piano' if self.input_mode_piano_radio.isChecked() else 'file',
             'midi_input_device': self.midi_input_combo.currentText().strip() or None,
             'window_geometry': self.saveGeometry().toBase64().data().decode('ascii'),
             'save_log_to_file': self.log_save_to_file_check.isChecked()
         }
-        try:
-            with open(self.config_path, 'w') as f: json.dump(config, f, indent=4)
-        except Exception as e: print(f"Error saving config: {e}")
+        for check, spinbox, _, enable_key, value_key in self._humanization_row_widgets:
+            config[enable_key] = check.isChecked()
+            config[value_key] = spinbox.value()
+        payload = json.dumps(config, indent=4)
+        if background:
+            threading.Thread(target=_write_config_file, args=(self.config_path, payload), daemon=True).start()
+        else:
+            _write_config_file(self.config_path, payload)
 
     def _update_enabled_states(self):
         for key, check in self.all_humanization_checks.items():
@@ -914,23 +1226,18 @@ class MainWindow(QMainWindow):
                     break
             self._update_88_key_visibility()
             internal_style = config.get('pedal_style', 'hybrid')
-            display_text = self.pedal_mapping_inv.get(internal_style, "Original (from MIDI)")
+            display_text = PEDAL_STYLE_NAMES.get(internal_style, "Original (from MIDI)")
             self.pedal_style_combo.setCurrentText(display_text)
             self.use_88_key_check.setChecked(config.get('use_88_key_layout', False))
             self.countdown_check.setChecked(config.get('countdown', True))
             self.select_all_humanization_check.setChecked(config.get('select_all_humanization', False))
             self.all_humanization_checks['simulate_hands'].setChecked(config.get('simulate_hands', False))
             self.all_humanization_checks['enable_chord_roll'].setChecked(config.get('enable_chord_roll', False))
-            self.all_humanization_checks['vary_timing'].setChecked(config.get('enable_vary_timing', config.get('vary_timing', False)))
-            self.all_humanization_spinboxes['vary_timing'].setValue(config.get('value_timing_variance', 0.010))
-            self.all_humanization_checks['vary_articulation'].setChecked(config.get('enable_vary_articulation', False))
-            self.all_humanization_spinboxes['vary_articulation'].setValue(config.get('value_articulation', 95.0))
-            self.all_humanization_checks['hand_drift'].setChecked(config.get('enable_hand_drift', False))
-            self.all_humanization_spinboxes['hand_drift'].setValue(config.get('value_hand_drift_decay', 25.0))
-            self.all_humanization_checks['mistake_chance'].setChecked(config.get('enable_mistakes', False))
-            self.all_humanization_spinboxes['mistake_chance'].setValue(config.get('value_mistake_chance', 0.5))
-            self.all_humanization_checks['tempo_sway'].setChecked(config.get('enable_tempo_sway', False))
-            self.all_humanization_spinboxes['tempo_sway'].setValue(config.get('value_tempo_sway_intensity', 0.015))
+            if 'enable_vary_timing' not in config and 'vary_timing' in config:
+                config['enable_vary_timing'] = config['vary_timing']   # Legacy key.
+            for check, spinbox, def_val, enable_key, value_key in self._humanization_row_widgets:
+                check.setChecked(config.get(enable_key, False))
+                spinbox.setValue(config.get(value_key, def_val))
             self.all_humanization_checks['invert_tempo_sway'].setChecked(config.get('invert_tempo_sway', False))
             self.always_top_check.setChecked(config.get('always_on_top', False))
             self.opacity_slider.setValue(config.get('opacity', 100))
@@ -938,7 +1245,7 @@ class MainWindow(QMainWindow):
             saved_hotkey = config.get('hotkey')
             if saved_hotkey:
                 self.hotkey_manager.current_key = _parse_hotkey_string(saved_hotkey)
-                self.hk_label.setText(f"Start/Stop Hotkey: {self.hotkey_manager._format_key_string(self.hotkey_manager.current_key)}")
+                self.hk_label.setText(f"Start/Stop Hotkey: {self.hotkey_manager.current_key_str}")
             input_mode = config.get('input_mode', 'file')
             self.input_mode_file_radio.setChecked(input_mode != 'piano')
             self.input_mode_piano_radio.setChecked(input_mode == 'piano')
@@ -961,33 +1268,11 @@ class MainWindow(QMainWindow):
         if not self.selected_tracks_info:
              self.add_log_message("Play aborted: no MIDI file or tracks selected.")
              QMessageBox.warning(self, "No Tracks", "Please select a MIDI file and choose tracks first."); return None
-        display_text = self.pedal_style_combo.currentText()
-        internal_style = self.pedal_mapping.get(display_text, 'hybrid')
-        return {
-            'midi_file': self.file_path_label.toolTip(), 
-            'tempo': self.tempo_spinbox.value(), 
-            'countdown': self.countdown_check.isChecked(),
-            'use_88_key_layout': self.use_88_key_check.isChecked(),
-            'pedal_style': internal_style,
-            'output_mode': self._current_output_mode(),
-            'simulate_hands': self.all_humanization_checks['simulate_hands'].isChecked(),
-            'vary_velocity': False,
-            'enable_chord_roll': self.all_humanization_checks['enable_chord_roll'].isChecked(),
-            'vary_timing': self.all_humanization_checks['vary_timing'].isChecked(), 
-            'timing_variance': self.all_humanization_spinboxes['vary_timing'].value(),
-            'vary_articulation': self.all_humanization_checks['vary_articulation'].isChecked(), 
-            'articulation': self.all_humanization_spinboxes['vary_articulation'].value() / 100.0,
-            'enable_drift_correction': self.all_humanization_checks['hand_drift'].isChecked(), 
-            'drift_decay_factor': self.all_humanization_spinboxes['hand_drift'].value() / 100.0,
-            'enable_mistakes': self.all_humanization_checks['mistake_chance'].isChecked(), 
-            'mistake_chance': self.all_humanization_spinboxes['mistake_chance'].value(),
-            'enable_tempo_sway': self.all_humanization_checks['tempo_sway'].isChecked(), 
-            'tempo_sway_intensity': self.all_humanization_spinboxes['tempo_sway'].value(),
-            'invert_tempo_sway': self.all_humanization_checks['invert_tempo_sway'].isChecked(),
-        }
+        return self._read_playback_settings().to_player_config(self.file_path_label.toolTip())
 
     def select_file(self):
-        if self.player_thread and self.player_thread.isRunning(): return
+        if self.player: return
+        if self.parse_thread is not None: return
         filepath, _ = QFileDialog.getOpenFileName(self, "Select MIDI File", "", "MIDI Files (*.mid *.midi)")
         if filepath:
             self.file_path_label.setText(os.path.basename(filepath))
@@ -996,13 +1281,36 @@ class MainWindow(QMainWindow):
             self._parse_and_select_tracks(filepath)
 
     def _parse_and_select_tracks(self, filepath):
+        """Parse on a worker thread; the track dialog opens from _on_midi_parsed."""
         self.add_log_message("Parsing MIDI structure...")
-        try:
-            tracks, tempo_map = MidiParser.parse_structure(filepath, 1.0)
-        except Exception as e:
-            self.add_log_message(f"Failed to parse MIDI: {e}")
-            QMessageBox.critical(self, "Error", f"Failed to parse MIDI:\n{e}")
-            return
+        self.statusBar().showMessage("Parsing MIDI...")
+        self.browse_button.setEnabled(False)
+        # The previous file's track selection no longer matches the path label.
+        self.selected_tracks_info = None
+        self.play_button.setEnabled(False)
+        self.reset_button.setEnabled(False)
+        self.parse_thread = QThread()
+        self.parse_worker = MidiParseWorker(filepath)
+        self.parse_worker.moveToThread(self.parse_thread)
+        self.parse_thread.started.connect(self.parse_worker.run)
+        self.parse_worker.parsed.connect(self._on_midi_parsed)
+        self.parse_worker.parse_error.connect(self._on_midi_parse_error)
+        self.parse_worker.finished.connect(self.parse_thread.quit)
+        self.parse_thread.finished.connect(self._on_midi_parse_finished)
+        self.parse_thread.start()
+
+    def _on_midi_parse_error(self, error_msg):
+        self.add_log_message(f"Failed to parse MIDI: {error_msg}")
+        QMessageBox.critical(self, "Error", f"Failed to parse MIDI:\n{error_msg}")
+
+    def _on_midi_parse_finished(self):
+        self.parse_thread.wait()
+        self.parse_thread = None
+        self.parse_worker = None
+        self.statusBar().clearMessage()
+        self.browse_button.setEnabled(True)
+
+    def _on_midi_parsed(self, tracks, tempo_map):
         dialog = TrackSelectionDialog(tracks, self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             self.selected_tracks_info = dialog.get_selection()
@@ -1013,15 +1321,12 @@ class MainWindow(QMainWindow):
 
             preview_notes = []
             for track, role in self.selected_tracks_info:
-                for note in track.notes:
-                    n = copy.deepcopy(note)
-                    if role == "Left Hand": n.hand = 'left'
-                    elif role == "Right Hand": n.hand = 'right'
-                    else: n.hand = 'left' if n.pitch < 60 else 'right'
-                    preview_notes.append(n)
-            preview_notes.sort(key=lambda n: n.start_time)
-            self.current_notes = preview_notes
-            total_dur = max(n.end_time for n in preview_notes) if preview_notes else 1.0
+                hand = ROLE_HANDS.get(role)
+                if hand: preview_notes.extend(note.copy(hand) for note in track.notes)
+                else: preview_notes.extend(note.copy('left' if note.pitch < 60 else 'right')
+                                           for note in track.notes)
+            preview_notes.sort(key=_START_TIME)
+            total_dur = self._set_current_notes(preview_notes)
             self.total_song_duration_sec = total_dur
             self.timeline_widget.set_data(preview_notes, total_dur, tempo_map)
             self.timeline_widget.set_position(0)
@@ -1035,57 +1340,53 @@ class MainWindow(QMainWindow):
             self.reset_button.setEnabled(False)
 
     def handle_play(self):
-        if self.player_thread and self.player_thread.isRunning(): 
+        if self.player:
             self.toggle_playback_state()
             return
+        if self.prep_thread is not None or self.parse_thread is not None: return
         config = self.gather_config()
         if not config: return
-        self._save_config()
+        self._save_config(background=True)
         self.add_log_message("Preparing playback...")
-        tempo_scale = config['tempo'] / 100.0
-        try:
-             tracks, tempo_map = MidiParser.parse_structure(config['midi_file'], tempo_scale)
-             selected_indices = [t.index for t, _ in self.selected_tracks_info]
-             role_map = {t.index: r for t, r in self.selected_tracks_info}
-             final_notes = []
-             raw_pedal_events = []
-             for track in tracks:
-                 raw_pedal_events.extend(track.pedal_events)
-                 if track.index in selected_indices:
-                     role = role_map[track.index]
-                     for note in track.notes:
-                         new_note = copy.deepcopy(note)
-                         if role == "Left Hand": new_note.hand = 'left'
-                         elif role == "Right Hand": new_note.hand = 'right'
-                         final_notes.append(new_note)
-             raw_pedal_events.sort(key=lambda pe: pe[0])
-             config['raw_pedal_events'] = raw_pedal_events
-        except Exception as e:
-             self.add_log_message(f"Error preparing playback: {e}")
-             QMessageBox.critical(self, "Error", f"Error preparing playback:\n{e}")
-             return
-
-        final_notes.sort(key=lambda n: n.start_time)
-        self.current_notes = final_notes 
-        
-        if config['simulate_hands']:
-            self.add_log_message("Simulating hands for unassigned notes...")
-            engine = FingeringEngine()
-            engine.assign_hands(final_notes)
-        else:
-             for note in final_notes:
-                 if note.hand == 'unknown':
-                     note.hand = 'left' if note.pitch < 60 else 'right'
-
-        self.add_log_message("Analyzing musical structure...")
-        analyzer = SectionAnalyzer(final_notes, tempo_map)
-        sections = analyzer.analyze()
+        self.set_controls_enabled(False)
+        self.play_button.setEnabled(False)
+        self._prep_config = config
+        self.prep_thread = QThread()
+        self.prep_worker = NotePrepWorker(config, self.selected_tracks_info, self._prep_cache)
+        self.prep_worker.moveToThread(self.prep_thread)
+        self.prep_thread.started.connect(self.prep_worker.run)
+        self.prep_worker.status.connect(self.add_log_message)
+        self.prep_worker.prepared.connect(self._on_notes_prepared)
+        self.prep_worker.prep_error.connect(self._on_prep_error)
+        self.prep_worker.finished.connect(self.prep_thread.quit)
+        self.prep_thread.finished.connect(self._on_prep_finished)
+        self.prep_thread.start()
+
+    def _on_prep_error(self, error_msg):
+        self.add_log_message(f"Error preparing playback: {error_msg}")
+        QMessageBox.critical(self, "Error", f"Error preparing playback:\n{error_msg}")
+        self.set_controls_enabled(True)
+        self.play_button.setEnabled(True)
+
+    def _on_prep_finished(self):
+        self.prep_thread.wait()
+        self.prep_thread = None
+        self.prep_worker = None
+        self._prep_config = None
+
+    def _on_notes_prepared(self, final_notes, tempo_map, compiled_events):
+        """Continuation of handle_play once NotePrepWorker is done: publish notes and start the Player."""
+        if self._closing: return   # Window closed while preparing; drop the result.
+        # Imported on first play so startup does not load the playback stack.
+        from player import Player
+        config = self._prep_config
+        # Publish only the finished list; current_notes is never edited in place.
+        total_dur = self._set_current_notes(final_notes)
 
         seek_ratio = 0.0
         if self.timeline_widget.total_duration > 0:
             seek_ratio = self.timeline_widget.current_time / self.timeline_widget.total_duration
 
-        total_dur = max(n.end_time for n in final_notes) if final_notes else 1.0
         self.timeline_widget.set_data(final_notes, total_dur, tempo_map)
         self.total_song_duration_sec = total_dur
 
@@ -1094,24 +1395,22 @@ class MainWindow(QMainWindow):
         self.set_controls_enabled(False)
         self.play_button.setEnabled(True) 
         self.stop_button.setEnabled(True)
-        key_str = self.hotkey_manager._format_key_string(self.hotkey_manager.current_key)
+        key_str = self.hotkey_manager.current_key_str
         self.play_button.setText(f"Pause ({key_str})")
         
         self.tabs.setCurrentIndex(1)
         
         backend = create_backend(config['output_mode'],
                                  config.get('use_88_key_layout', False))
-        compiled_events = EventCompiler.compile(final_notes, sections, config)
 
-        self.player_thread = QThread()
         self.player = Player(compiled_events, backend, config, total_dur)
         self.player.moveToThread(self.player_thread)
-        self.player_thread.started.connect(self.player.play)
+        self.player_start_requested.connect(self.player.play, Qt.ConnectionType.SingleShotConnection)
         self.player.playback_finished.connect(self.on_playback_finished)
         self.player.status_updated.connect(self.add_log_message)
         self.player.progress_updated.connect(self.update_progress)
-        self.player.visualizer_updated.connect(self.piano_widget.set_pitch_active)
-        self.player_thread.start()
+        self.player.visualizer_updated.connect(self.piano_widget.set_active_mask)
+        self.player_start_requested.emit()
 
     def handle_stop(self):
         if self.player: self.player.stop()
@@ -1121,7 +1420,7 @@ class MainWindow(QMainWindow):
         self.timeline_widget.set_position(0)
         self._update_time_label(0, self.total_song_duration_sec)
         self._on_visual_scrub(0)
-        if self.player and self.player_thread and self.player_thread.isRunning():
+        if self.player:
             self.player.seek(0)
 
     def on_playback_finished(self):
@@ -1129,22 +1428,30 @@ class MainWindow(QMainWindow):
         self.piano_widget.clear()
         self.set_controls_enabled(True)
         self.stop_button.setEnabled(False)
-        self.play_button.setText(f"Play ({self.hotkey_manager._format_key_string(self.hotkey_manager.current_key)})")
-        if self.player_thread:
-            self.player_thread.quit()
-            self.player_thread.wait()
+        self.play_button.setText(f"Play ({self.hotkey_manager.current_key_str})")
+        if self.player:
+            self.player.deleteLater()   # Runs on player_thread once play() has returned.
         self.player = None
-        self.player_thread = None
 
     def closeEvent(self, event):
+        self._closing = True
         self._save_config()
+        self._flush_log()
+        if self.parse_thread is not None:
+            self.parse_thread.quit()
+            self.parse_thread.wait(2000)
+        if self.prep_thread is not None:
+            # The worker cannot be interrupted; let it finish (its result is dropped).
+            self.prep_thread.quit()
+            self.prep_thread.wait()
         if self.midi_input_active:
             self._disconnect_midi_input()
         if self.live_backend:
             self.live_backend.shutdown()
-        if self.player and self.player_thread and self.player_thread.isRunning():
+        if self.player:
             self.player.stop()
-            self.player_thread.wait(1000)
+        self.player_thread.quit()
+        self.player_thread.wait(1000)
         event.accept()
 
 if __name__ == "__main__":
@@ -4,9 +4,20 @@ from dataclasses import dataclass, field
 from typing import List, Optional, Tuple
 
 
-@dataclass
+# GM program -> instrument_name: families of 8 up to Ensemble, then the raw program number.
+_PROGRAM_INSTRUMENTS = tuple(
+    ["Piano"] * 8 + ["Chromatic Perc"] * 8 + ["Organ"] * 8 + ["Guitar"] * 8
+    + ["Bass"] * 8 + ["Strings"] * 8 + ["Ensemble"] * 8
+    + [f"Instrument {i}" for i in range(56, 128)])
+
+
+@dataclass(slots=True)
 class Note:
-    """Single note: pitch (MIDI 0–127), start/duration in seconds, optional hand assignment."""
+    """Single note: pitch (MIDI 0–127), start/duration in seconds, optional hand assignment.
+
+    end_time (start_time + duration) is stored, not computed; code that edits start_time or
+    duration must update it too.
+    """
     id: int
     pitch: int
     velocity: int
@@ -15,12 +26,17 @@ class Note:
     hand: str = 'unknown'
     original_track_index: int = -1
     channel: int = -1
+    end_time: float = field(init=False)
 
-    @property
-    def end_time(self) -> float:
-        return self.start_time + self.duration
+    def __post_init__(self):
+        self.end_time = self.start_time + self.duration
 
-@dataclass
+    def copy(self, hand: Optional[str] = None) -> "Note":
+        """Independent copy, optionally with a different hand; a direct constructor call, much cheaper than dataclasses.replace."""
+        return Note(self.id, self.pitch, self.velocity, self.start_time, self.duration,
+                    self.hand if hand is None else hand, self.original_track_index, self.channel)
+
+@dataclass(slots=True)
 class MidiTrack:
     """Single MIDI track metadata plus list of notes; instrument_name uses GM program ranges."""
     index: int
@@ -37,26 +53,20 @@ class MidiTrack:
     @property
     def instrument_name(self) -> str:
         if self.is_drum: return "Drums/Percussion"
-        if 0 <= self.program_change <= 7: return "Piano"
-        if 8 <= self.program_change <= 15: return "Chromatic Perc"
-        if 16 <= self.program_change <= 23: return "Organ"
-        if 24 <= self.program_change <= 31: return "Guitar"
-        if 32 <= self.program_change <= 39: return "Bass"
-        if 40 <= self.program_change <= 47: return "Strings"
-        if 48 <= self.program_change <= 55: return "Ensemble"
+        if 0 <= self.program_change < len(_PROGRAM_INSTRUMENTS): return _PROGRAM_INSTRUMENTS[self.program_change]
         return f"Instrument {self.program_change}"
 
-@dataclass(order=True)
+@dataclass(slots=True)
 class KeyEvent:
     """Event at a given time: key press/release or pedal; priority used to order same-frame events."""
     time: float
-    priority: int = field(compare=True)
-    action: str = field(compare=False)
-    key_char: str = field(compare=False)
-    pitch: Optional[int] = field(default=None, compare=False)
-    velocity: int = field(default=100, compare=False)
+    priority: int
+    action: str
+    key_char: str
+    pitch: Optional[int] = None
+    velocity: int = 100
 
-@dataclass
+@dataclass(slots=True)
 class MusicalSection:
     """Time span of notes with articulation and pace labels for humanization/rubato."""
     start_time: float
@@ -66,8 +76,13 @@ class MusicalSection:
     pace_label: str = 'normal'
     start_beat: float = 0.0
     end_beat: float = 0.0
+    max_end_time: Optional[float] = None   # Latest note end; computed from notes if not given.
+
+    def __post_init__(self):
+        if self.max_end_time is None:
+            self.max_end_time = max((n.end_time for n in self.notes), default=self.end_time)
 
-@dataclass
+@dataclass(slots=True)
 class KeyState:
     """Tracks whether a key is currently down or sustained by pedal."""
     key_char: str
@@ -85,7 +100,7 @@ class KeyState:
     def is_physically_down(self) -> bool:
         return self.is_active
 
-@dataclass
+@dataclass(slots=True)
 class Finger:
     """Finger slot for fingering engine (id, hand, current pitch, last press time)."""
     id: int
@@ -61,8 +61,7 @@ class KeyboardBackend(OutputBackend):
         data = self._mapper.get_key_data(pitch)
         if not data:
             return
-        base_key = data['key']
-        modifiers = data['modifiers']
+        base_key, modifiers = data
         state = self._state_for(base_key)
 
         was_down = state.is_physically_down
@@ -84,7 +83,7 @@ class KeyboardBackend(OutputBackend):
         data = self._mapper.get_key_data(pitch)
         if not data:
             return
-        base_key = data['key']
+        base_key = data[0]
         state = self._states.get(base_key)
         if not state:
             return
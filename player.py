@@ -2,12 +2,13 @@
 
 import sys
 import time
-import copy
 import heapq
+import itertools
 
 import random
 import bisect
 import threading
+from operator import attrgetter
 from typing import List, Dict, Set, Optional
 
 from PyQt6.QtCore import QObject, pyqtSignal as Signal
@@ -17,6 +18,8 @@ from core import TempoMap, KeyMapper
 from analysis import Humanizer, PedalGenerator
 from output import OutputBackend
 
+_START_TIME = attrgetter('start_time')   # Sort key for notes.
+
 
 # ---------------------------------------------------------------------------
 # Windows high-resolution timer helpers
@@ -66,7 +69,7 @@ class EventCompiler:
     @staticmethod
     def compile(notes: List[Note], sections: List[MusicalSection],
                 config: Dict) -> List[KeyEvent]:
-        work = copy.deepcopy(notes)
+        work = [n.copy() for n in notes]   # Humanization edits these copies.
 
         # --- optional humanization (delegates to analysis.py) ---
         humanize_keys = ('vary_timing', 'vary_articulation',
@@ -80,11 +83,17 @@ class EventCompiler:
                       & {round(n.start_time, 2) for n in right})
             humanizer.apply_to_hand(left, 'left', resync)
             humanizer.apply_to_hand(right, 'right', resync)
-            work = sorted(left + right, key=lambda n: n.start_time)
+            work = sorted(left + right, key=_START_TIME)
             humanizer.apply_tempo_rubato(work, sections)
 
         # --- build press / release events ---
+        # Heap entries are (time, priority, seq, event): plain tuple compares, ties kept in push order.
         heap: list = []
+        seq = itertools.count()
+
+        def push(ev: KeyEvent):
+            heapq.heappush(heap, (ev.time, ev.priority, next(seq), ev))
+
         use_mistakes = config.get('enable_mistakes', False)
         mistake_chance = config.get('mistake_chance', 0) / 100.0
         played_in_section: Set[int] = set()
@@ -108,19 +117,19 @@ class EventCompiler:
                     and random.random() < mistake_chance):
                 mp = EventCompiler._mistake_pitch(pitch)
                 if mp is not None:
-                    heapq.heappush(heap, KeyEvent(
+                    push(KeyEvent(
                         note.start_time, 2, 'press', '',
                         pitch=mp, velocity=note.velocity))
-                    heapq.heappush(heap, KeyEvent(
+                    push(KeyEvent(
                         note.end_time, 4, 'release', '',
                         pitch=mp, velocity=0))
                     did_mistake = True
 
             if not did_mistake:
-                heapq.heappush(heap, KeyEvent(
+                push(KeyEvent(
                     note.start_time, 2, 'press', '',
                     pitch=pitch, velocity=note.velocity))
-                heapq.heappush(heap, KeyEvent(
+                push(KeyEvent(
                     note.end_time, 4, 'release', '',
                     pitch=pitch, velocity=0))
 
@@ -128,11 +137,11 @@ class EventCompiler:
 
         # --- pedal events (from analysis.py) ---
         for pe in PedalGenerator.generate_events(config, work, sections):
-            heapq.heappush(heap, pe)
+            push(pe)
 
         events: List[KeyEvent] = []
         while heap:
-            events.append(heapq.heappop(heap))
+            events.append(heapq.heappop(heap)[3])
         return events
 
     @staticmethod
@@ -161,7 +170,7 @@ class Player(QObject):
     status_updated = Signal(str)
     progress_updated = Signal(float)
     playback_finished = Signal()
-    visualizer_updated = Signal(int, bool)
+    visualizer_updated = Signal(object)   # Bitmask of sounding pitches (bit p = MIDI pitch p), ~60 Hz max.
     auto_paused = Signal()
 
     def __init__(self, compiled_events: List[KeyEvent],
@@ -181,6 +190,8 @@ class Player(QObject):
         self.total_paused_time = 0.0
         self._pause_ts = 0.0
         self._pending_shutdown = False
+        self._active_mask = 0
+        self._mask_dirty = False
 
     # -- public API (called from main thread) --
 
@@ -266,13 +277,19 @@ class Player(QObject):
     def _loop_body(self):
         last_progress = 0.0
         progress_iv = 1.0 / 30.0
+        last_mask = 0.0
+        mask_iv = 1.0 / 60.0
 
         while not self.stop_event.is_set():
             if self._pending_shutdown:
                 self._pending_shutdown = False
                 self.backend.shutdown()
+                self._active_mask = 0   # shutdown() released every key.
+                self._mask_dirty = True
 
             if self.pause_event.is_set():
+                if self._mask_dirty:
+                    self._emit_active_mask()
                 time.sleep(0.05)
                 continue
 
@@ -283,6 +300,8 @@ class Player(QObject):
                 if pt > self.total_duration + 0.1:
                     self.status_updated.emit("Playback finished.")
                     break
+                if self._mask_dirty:
+                    self._emit_active_mask()
                 time.sleep(0.005)
                 continue
 
@@ -290,6 +309,12 @@ class Player(QObject):
             wait = nxt.time - pt
 
             if wait > 0:
+                # Flush a pending key mask mid-wait if it falls due before the next batch.
+                if self._mask_dirty and last_mask + mask_iv - now < wait:
+                    _precise_sleep(last_mask + mask_iv - now)
+                    self._emit_active_mask()
+                    last_mask = time.perf_counter()
+                    wait = nxt.time - ((last_mask - self.start_time) - self.total_paused_time)
                 _precise_sleep(wait)
 
             batch: List[KeyEvent] = []
@@ -307,10 +332,17 @@ class Player(QObject):
 
             now = time.perf_counter()
             pt = (now - self.start_time) - self.total_paused_time
+            if self._mask_dirty and now - last_mask >= mask_iv:
+                self._emit_active_mask()
+                last_mask = now
             if now - last_progress >= progress_iv:
                 self.progress_updated.emit(pt)
                 last_progress = now
 
+    def _emit_active_mask(self):
+        self._mask_dirty = False
+        self.visualizer_updated.emit(self._active_mask)
+
     def _execute_batch(self, events: List[KeyEvent]):
         """Execute a batch of events that fall within the same time-slice.
 
@@ -334,11 +366,15 @@ class Player(QObject):
                 return
             if e.pitch is not None:
                 self.backend.note_off(e.pitch)
-                self.visualizer_updated.emit(e.pitch, False)
+                if e.pitch >= 0:
+                    self._active_mask &= ~(1 << e.pitch)
+                    self._mask_dirty = True
 
         for e in presses:
             if self.stop_event.is_set():
                 return
             if e.pitch is not None:
                 self.backend.note_on(e.pitch, e.velocity)
-                self.visualizer_updated.emit(e.pitch, True)
+                if e.pitch >= 0:
+                    self._active_mask |= 1 << e.pitch
+                    self._mask_dirty = True
@@ -1,9 +1,10 @@
 """Piano keyboard highlight (active pitches) and timeline (note bars, measure lines, playhead)."""
 
 from PyQt6.QtWidgets import QWidget, QSizePolicy
-from PyQt6.QtCore import Qt, QRectF, QPointF, pyqtSignal as Signal
+from PyQt6.QtCore import Qt, QRect, QRectF, QPointF, pyqtSignal as Signal
 from PyQt6.QtGui import QPainter, QBrush, QColor, QPen
 from typing import List, Set
+import numpy as np
 from models import Note
 from core import TempoMap
 
@@ -20,14 +21,36 @@ class PianoWidget(QWidget):
         self.max_pitch = 108  # C8
         self.white_keys_count = 52
         self.black_keys = {1, 3, 6, 8, 10}   # Semitones that are black keys (mod 12) 
+        self._white_index = {}   # White pitch -> column, for invalidating single keys.
+        for p in range(self.min_pitch, self.max_pitch + 1):
+            if (p % 12) not in self.black_keys: self._white_index[p] = len(self._white_index)
+
+    def set_active_mask(self, mask: int):
+        """Like set_active_pitches, from a bitmask where bit p is MIDI pitch p."""
+        pitches = set()
+        while mask:
+            low = mask & -mask
+            pitches.add(low.bit_length() - 1)
+            mask ^= low
+        self.set_active_pitches(pitches)
 
-    def set_pitch_active(self, pitch: int, active: bool):
-        if active: self.active_pitches.add(pitch)
-        else: self.active_pitches.discard(pitch)
-        
     def set_active_pitches(self, pitches: Set[int]):
+        """Replace the active set; repaint only the keys whose state changed."""
+        changed = pitches ^ self.active_pitches
         self.active_pitches = pitches
-        self.update()
+        for p in changed:
+            rect = self._key_rect(p)
+            if rect is not None: self.update(rect.toAlignedRect().adjusted(-1, -1, 1, 1))
+
+    def _key_rect(self, pitch: int):
+        """Rect of *pitch* as drawn by paintEvent, or None if it is not drawn."""
+        key_width = self.width() / self.white_keys_count
+        if pitch in self._white_index:
+            return QRectF(self._white_index[pitch] * key_width, 0, key_width, self.height())
+        if pitch - 1 not in self._white_index: return None
+        black_key_width = key_width * 0.65
+        x = (self._white_index[pitch - 1] + 1) * key_width - (black_key_width / 2)
+        return QRectF(x, 0, black_key_width, self.height() * 0.6)
         
     def clear(self):
         self.active_pitches.clear()
@@ -93,6 +116,8 @@ class TimelineWidget(QWidget):
         self.pixels_per_second = 50   # Zoom: width = duration * this
         self.tempo_map = None
         self._cached_boundaries = None   # Measure (start, end) times; avoid recompute in paint.
+        self._note_starts = np.empty(0)   # Start times of notes (sorted), for culling in paint.
+        self._max_note_dur = 0.0
 
         self.bg_color = QColor(30, 30, 30)
         self.left_hand_color = QColor(80, 160, 255, 200)   # Blue
@@ -102,8 +127,10 @@ class TimelineWidget(QWidget):
         self.measure_line_color = QColor(255, 255, 255, 50)
 
     def set_data(self, notes: List[Note], duration: float, tempo_map: TempoMap = None):
-        """Set notes and duration; cache measure boundaries from tempo_map for paint."""
+        """Set notes (sorted by start) and duration; cache measure boundaries and note starts for paint."""
         self.notes = notes
+        self._note_starts = np.fromiter((n.start_time for n in notes), dtype=np.float64, count=len(notes))
+        self._max_note_dur = max((n.duration for n in notes), default=0.0)
         self.total_duration = max(duration, 0.1)
         self.tempo_map = tempo_map
         self._cached_boundaries = None
@@ -121,9 +148,13 @@ class TimelineWidget(QWidget):
         self.update()
 
     def set_position(self, time: float):
+        """Move the playhead; only the strips under the old and new cursor are repainted."""
         if not self.is_dragging:
+            old_x = self.current_time / self.total_duration * self.width()
             self.current_time = time
-            self.update()
+            new_x = time / self.total_duration * self.width()
+            self.update(QRect(int(old_x) - 3, 0, 6, self.height()))
+            self.update(QRect(int(new_x) - 3, 0, 6, self.height()))
 
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
@@ -166,8 +197,16 @@ class TimelineWidget(QWidget):
             range_p = max_p - min_p
             
             painter.setPen(Qt.PenStyle.NoPen)
-            
-            for note in self.notes:
+            brushes = {'left': QBrush(self.left_hand_color), 'right': QBrush(self.right_hand_color)}
+            unknown_brush = QBrush(self.unknown_color)
+
+            # Notes are sorted by start; draw only those that can overlap the exposed area.
+            exposed = event.rect()
+            t_lo = (exposed.left() - 1) / w * self.total_duration - self._max_note_dur   # -1 px: bars are at least 1 px wide.
+            t_hi = (exposed.right() + 1) / w * self.total_duration
+            lo = int(np.searchsorted(self._note_starts, t_lo, side='left'))
+            hi = int(np.searchsorted(self._note_starts, t_hi, side='right'))
+            for note in self.notes[lo:hi]:
                 nx = (note.start_time / self.total_duration) * w
                 nw = (note.duration / self.total_duration) * w
                 nw = max(1.0, nw)
@@ -176,12 +215,7 @@ class TimelineWidget(QWidget):
                 ny = ny_ratio * (h - 10) + 5
                 nh = 8 
                 
-                if note.hand == 'left':
-                    painter.setBrush(QBrush(self.left_hand_color))
-                elif note.hand == 'right':
-                    painter.setBrush(QBrush(self.right_hand_color))
-                else:
-                    painter.setBrush(QBrush(self.unknown_color))
+                painter.setBrush(brushes.get(note.hand, unknown_brush))
                 
                 painter.drawRect(QRectF(nx, ny, nw, nh))
 